@@ -1,5 +1,8 @@
 import os
 import sqlite3
+import logging
+
+logger = logging.getLogger("hiremind.db_init")
 
 BASE = os.path.dirname(os.path.abspath(__file__))
 
@@ -9,6 +12,9 @@ USER_DB = os.path.join(BASE, "../services/user_auth.db")
 def create_user_auth_tables():
     conn = sqlite3.connect(USER_DB)
     cur = conn.cursor()
+    # journal_mode is the only PRAGMA stored in the database file; per-connection
+    # tuning (synchronous, cache_size, mmap_size, ...) belongs in each service's _open
+    cur.execute("PRAGMA journal_mode=WAL")
     cur.execute('''
     CREATE TABLE IF NOT EXISTS recruiters (
         recruiter_id   INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -30,12 +36,16 @@ def create_user_auth_tables():
     ''')
     conn.commit()
     conn.close()
-    print("Recruiter & Candidate auth tables created in user_auth.db.")
+    logger.info("Recruiter & Candidate auth tables created in %s.", USER_DB)
 
 
 def main():
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
     create_user_auth_tables()
-    print("✅ All databases and tables initialized successfully.")
+    logger.info("All databases and tables initialized successfully.")
 
 if __name__ == "__main__":
     main()
@@ -1,41 +1,194 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from openai import OpenAI
+from openai import AsyncOpenAI
 import os
 import sqlite3
-import json
+import asyncio
+import queue
+import orjson
+import hashlib
+import logging
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
-app = FastAPI()
-client = OpenAI()
+app = FastAPI(default_response_class=ORJSONResponse)
+client = AsyncOpenAI()
+
+# Comma-separated list of browser origins allowed to call this service
+ALLOWED_ORIGINS = [o.strip() for o in os.getenv("FRONTEND_ORIGIN", "http://localhost:3000").split(",") if o.strip()]
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"], #specify the exact internal IP in production
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["authorization", "content-type"],
 )
 
 # ========== Persistent Storage Setup ==========
-conn = sqlite3.connect("scoring_cache.db", check_same_thread=False)
-cursor = conn.cursor()
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS interview_sessions (
-        session_key TEXT PRIMARY KEY,
-        candidate_id TEXT,
-        job_id TEXT,
-        questions TEXT,
-        answers TEXT,
-        categories TEXT,
-        context TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-''')
-conn.commit()
+DB_PATH = os.getenv("ADAPTIVE_DB_PATH", "scoring_cache.db")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", min(os.cpu_count() or 1, WEB_CONCURRENCY * 2)))
+
+# Optionally keep the hot session cache in memory and snapshot it to DB_PATH periodically
+IN_MEMORY = os.getenv("ADAPTIVE_DB_IN_MEMORY", "false").lower() == "true"
+MEMORY_DB_URI = "file:scoring_cache?mode=memory&cache=shared"
+SNAPSHOT_INTERVAL = int(os.getenv("DB_SNAPSHOT_INTERVAL", "300"))
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections; each checkout gets its own cursor."""
+
+    def __init__(self, path, size, uri=False, restore_from=None):
+        self.path = path
+        self.uri = uri
+        # Memory DBs vanish with their last connection, so new ones are seeded from this file
+        self.restore_from = restore_from
+        self._pool = queue.Queue(maxsize=size)
+        for _ in range(size):
+            self._pool.put(self._connect())
+
+    def _connect(self):
+        c = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256, uri=self.uri)
+        if self.restore_from and os.path.exists(self.restore_from):
+            disk = sqlite3.connect(self.restore_from)
+            disk.backup(c)
+            disk.close()
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("PRAGMA temp_store=MEMORY")
+        c.execute("PRAGMA mmap_size=268435456")
+        c.execute("PRAGMA cache_size=-65536")
+        return c
+
+    @contextmanager
+    def acquire(self):
+        c = self._pool.get()
+        try:
+            try:
+                c.execute("SELECT 1")
+            except sqlite3.Error:
+                c.close()
+                c = self._connect()
+            try:
+                yield c, c.cursor()
+            except Exception:
+                c.rollback()
+                raise
+        finally:
+            self._pool.put(c)
+
+
+if IN_MEMORY:
+    # Shared-cache memory DBs lock per table and return SQLITE_LOCKED rather than
+    # waiting, so a single connection is used; every statement is in-memory anyway.
+    # Reconnecting after a failed ping reloads the last snapshot rather than starting empty.
+    pool = ConnectionPool(MEMORY_DB_URI, 1, uri=True, restore_from=DB_PATH)
+else:
+    pool = ConnectionPool(DB_PATH, max(POOL_SIZE, 1))
+
+with pool.acquire() as (c, cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS interview_sessions (
+            session_key TEXT PRIMARY KEY,
+            candidate_id TEXT,
+            job_id TEXT,
+            context TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS interview_turns (
+            session_key TEXT,
+            turn_idx INTEGER,
+            question TEXT,
+            answer TEXT,
+            category TEXT,
+            PRIMARY KEY (session_key, turn_idx)
+        )
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_sessions_candidate_job ON interview_sessions(candidate_id, job_id)")
+    # Move turns out of the legacy JSON array columns, if this DB still has them
+    legacy_columns = {row[1] for row in cur.execute("PRAGMA table_info(interview_sessions)")}
+    if "questions" in legacy_columns:
+        cur.execute('''
+            INSERT OR IGNORE INTO interview_turns (session_key, turn_idx, question, answer, category)
+            SELECT s.session_key, q.key, q.value,
+                   json_extract(s.answers, '$[' || q.key || ']'),
+                   json_extract(s.categories, '$[' || q.key || ']')
+            FROM interview_sessions s, json_each(s.questions) q
+            WHERE s.questions IS NOT NULL
+        ''')
+        cur.execute("UPDATE interview_sessions SET questions = NULL, answers = NULL, categories = NULL WHERE questions IS NOT NULL")
+        if cur.rowcount:
+            cur.execute("ANALYZE")
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS response_cache (
+            cache_key TEXT PRIMARY KEY,
+            response TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.commit()
+
+MAINTENANCE_INTERVAL = int(os.getenv("DB_MAINTENANCE_INTERVAL", "900"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(14 * 24 * 3600)))
+CACHE_TTL_MODIFIER = f"-{RESPONSE_CACHE_TTL} seconds"
+SQL_PURGE_CACHED_RESPONSES = "DELETE FROM response_cache WHERE created_at <= datetime('now', ?)"
+
+def run_db_maintenance():
+    with pool.acquire() as (c, cur):
+        cur.execute(SQL_PURGE_CACHED_RESPONSES, (CACHE_TTL_MODIFIER,))
+        c.commit()
+        cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        cur.execute("PRAGMA optimize")
+
+async def db_maintenance_loop():
+    # Keep the WAL file from growing unbounded between automatic checkpoints
+    while True:
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
+        try:
+            await asyncio.to_thread(run_db_maintenance)
+        except Exception as e:
+            logger.error("DB maintenance failed: %s", e)
+
+def write_snapshot():
+    tmp_path = DB_PATH + ".snapshot"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    with pool.acquire() as (c, cur):
+        cur.execute("VACUUM INTO ?", (tmp_path,))
+    os.replace(tmp_path, DB_PATH)
+
+async def snapshot_loop():
+    # Snapshot once up front so a reconnect always has the schema to restore
+    while True:
+        try:
+            await asyncio.to_thread(write_snapshot)
+        except Exception as e:
+            logger.error("DB snapshot failed: %s", e)
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+
+@app.on_event("startup")
+async def start_db_maintenance():
+    app.state.db_maintenance = asyncio.create_task(db_maintenance_loop())
+    if IN_MEMORY:
+        app.state.db_snapshot = asyncio.create_task(snapshot_loop())
+
+@app.on_event("startup")
+async def start_write_batcher():
+    app.state.write_batcher = asyncio.create_task(write_batcher.run())
+
+@app.on_event("shutdown")
+async def flush_db_snapshot():
+    if IN_MEMORY:
+        await asyncio.to_thread(write_snapshot)
 
 # ========== Input/Output Schemas ==========
 class EvalInput(BaseModel):
@@ -46,99 +199,193 @@ class EvalInput(BaseModel):
     job_id: str
     context: str
 
+    class Config:
+        extra = "ignore"
+        frozen = True
+
+class EvalBatchInput(BaseModel):
+    items: list[EvalInput]
+
+SQL_UPSERT_SESSION = '''
+    INSERT INTO interview_sessions (session_key, candidate_id, job_id, context)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(session_key) DO UPDATE SET context = excluded.context
+'''
+SQL_INSERT_TURN = '''
+    INSERT INTO interview_turns (session_key, turn_idx, question, answer, category)
+    SELECT ?, COALESCE(MAX(turn_idx) + 1, 0), ?, ?, ?
+    FROM interview_turns WHERE session_key = ?
+'''
+SQL_SELECT_CACHED_RESPONSE = "SELECT response FROM response_cache WHERE cache_key = ? AND created_at > datetime('now', ?)"
+SQL_INSERT_CACHED_RESPONSE = "INSERT OR REPLACE INTO response_cache (cache_key, response) VALUES (?, ?)"
+
+def write_turns(pool, payloads):
+    # One write transaction (and one WAL sync) for the whole batch
+    sessions = []
+    turns = []
+    for p in payloads:
+        session_key = f"{p.candidate_id}:{p.job_id}"
+        sessions.append((session_key, p.candidate_id, p.job_id, p.context))
+        turns.append((session_key, p.question, p.answer, p.category, session_key))
+    with pool.acquire() as (c, cur):
+        cur.execute("BEGIN IMMEDIATE")
+        cur.executemany(SQL_UPSERT_SESSION, sessions)
+        cur.executemany(SQL_INSERT_TURN, turns)
+        c.commit()
+
+
+class WriteBatcher:
+    """Group-commits turn writes from concurrent requests into a single transaction."""
+
+    def __init__(self, pool, max_batch=64, max_wait=0.01):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = asyncio.Queue()
+
+    async def submit(self, payloads):
+        # Resolves only after the transaction holding these rows has committed
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((payloads, fut))
+        await fut
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            payloads = [p for items, _ in batch for p in items]
+            try:
+                await asyncio.to_thread(write_turns, self.pool, payloads)
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_result(None)
+
+
+write_batcher = WriteBatcher(pool)
+
+EVAL_MODEL = "gpt-4o"
+
+# Static instructions go first so the provider can reuse its cached prompt prefix;
+# only the short question/answer trailer changes per request.
+EVAL_SYSTEM_PROMPT = """
+You are a human-like AI interviewer evaluating a candidate's response.
+
+## Task:
+1. Read the question and the candidate's answer carefully.
+2. Classify the quality of the answer as one of:
+- "strong"
+- "vague"
+- "incomplete"
+- "off-topic"
+3. Only suggest a **single follow-up** if the answer:
+- Misses key details relevant to the question
+- Is clearly weak or off-target
+
+4. **Do NOT suggest a follow-up**:
+- If the answer is brief but acceptable
+- If a follow-up would not add meaningful insight
+- If you've already followed up once before (assume 1 follow-up max)
+
+## Output Format (JSON):
+{
+"classification": "strong" | "vague" | "incomplete" | "off-topic",
+"follow_up": "..."  // optional, leave blank if not needed
+}
+
+The user message contains the question, the candidate's answer and the question category.
+""".strip()
+
+def response_cache_key(payload: EvalInput) -> str:
+    raw = f"{EVAL_MODEL}|{payload.question.strip()}|{payload.answer.strip()}|{payload.category.strip()}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def get_cached_response(cache_key):
+    with pool.acquire() as (c, cur):
+        cur.execute(SQL_SELECT_CACHED_RESPONSE, (cache_key, CACHE_TTL_MODIFIER))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+def put_cached_response(cache_key, response):
+    with pool.acquire() as (c, cur):
+        cur.execute(SQL_INSERT_CACHED_RESPONSE, (cache_key, response))
+        c.commit()
+
+async def evaluate_answer(payload: EvalInput) -> dict:
+    # Identical question/answer pairs are common across candidates; skip the LLM for those
+    cache_key = response_cache_key(payload)
+    cached = await asyncio.to_thread(get_cached_response, cache_key)
+    if cached is not None:
+        return orjson.loads(cached)
+
+    prompt = f"Question: {payload.question}\nAnswer: {payload.answer}\nCategory: {payload.category}"
+
+    stream = await client.chat.completions.create(
+        model=EVAL_MODEL,
+        messages=[
+            {"role": "system", "content": EVAL_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        response_format={"type": "json_object"},
+        stream=True
+    )
+    parts = []
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+    evaluation = "".join(parts).strip()
+    evaluation_dict = orjson.loads(evaluation)
+    await asyncio.to_thread(put_cached_response, cache_key, evaluation)
+    return evaluation_dict
+
 @app.post("/adaptive/evaluate")
 async def evaluate_response(payload: EvalInput):
-    prompt = f"""
-    You are a human-like AI interviewer evaluating a candidate's response.
-
-    ## Task:
-    1. Read the question and the candidate's answer carefully.
-    2. Classify the quality of the answer as one of:
-    - "strong"
-    - "vague"
-    - "incomplete"
-    - "off-topic"
-    3. Only suggest a **single follow-up** if the answer:
-    - Misses key details relevant to the question
-    - Is clearly weak or off-target
-
-    4. **Do NOT suggest a follow-up**:
-    - If the answer is brief but acceptable
-    - If a follow-up would not add meaningful insight
-    - If you've already followed up once before (assume 1 follow-up max)
-
-    ## Output Format (JSON):
-    {{
-    "classification": "strong" | "vague" | "incomplete" | "off-topic",
-    "follow_up": "..."  // optional, leave blank if not needed
-    }}
-
-    ## Context:
-    - Question: {payload.question}
-    - Answer: {payload.answer}
-    - Category: {payload.category}
-    """
-
     try:
-        result = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You classify and generate follow-ups."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"} 
+        # The turn row doesn't depend on the evaluation, so persist it while the LLM streams
+        evaluation_dict, _ = await asyncio.gather(
+            evaluate_answer(payload),
+            write_batcher.submit([payload])
         )
-        evaluation = result.choices[0].message.content.strip()
-        evaluation_dict = json.loads(evaluation)
-
-        
-        session_key = f"{payload.candidate_id}:{payload.job_id}"
-        cursor.execute("SELECT * FROM interview_sessions WHERE session_key = ?", (session_key,))
-        existing = cursor.fetchone()
-
-        question_list = [payload.question]
-        answer_list = [payload.answer]
-        category_list = [payload.category]
-
-        if existing:
-            existing_questions = json.loads(existing[3])
-            existing_answers = json.loads(existing[4])
-            existing_categories = json.loads(existing[5])
-
-            existing_questions.append(payload.question)
-            existing_answers.append(payload.answer)
-            existing_categories.append(payload.category)
-
-            cursor.execute('''
-                UPDATE interview_sessions
-                SET questions = ?, answers = ?, categories = ?, context = ?
-                WHERE session_key = ?
-            ''', (
-                json.dumps(existing_questions),
-                json.dumps(existing_answers),
-                json.dumps(existing_categories),
-                payload.context,
-                session_key
-            ))
-        else:
-            cursor.execute('''
-                INSERT INTO interview_sessions (session_key, candidate_id, job_id, questions, answers, categories, context)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                session_key,
-                payload.candidate_id,
-                payload.job_id,
-                json.dumps(question_list),
-                json.dumps(answer_list),
-                json.dumps(category_list),
-                payload.context
-            ))
-        conn.commit()
-
         return {"evaluation": evaluation_dict}
     except Exception as e:
         return {"error": str(e)}
 
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "8"))
+
+@app.post("/adaptive/evaluate_batch")
+async def evaluate_batch(payload: EvalBatchInput):
+    try:
+        sem = asyncio.Semaphore(EVAL_CONCURRENCY)
+
+        async def bounded(item):
+            async with sem:
+                return await evaluate_answer(item)
+
+        evaluations, _ = await asyncio.gather(
+            asyncio.gather(*(bounded(item) for item in payload.items)),
+            write_batcher.submit(payload.items)
+        )
+        return {"evaluations": evaluations}
+    except Exception as e:
+        return {"error": str(e)}
+
+# Probes hit this constantly; serve prebuilt bytes instead of serializing a dict each time
+HEALTH_RESPONSE = Response(content=b'{"status":"adaptive-engine live"}', media_type="application/json")
+
 @app.get("/health")
 def health():
-    return {"status": "adaptive-engine live"}
+    return HEALTH_RESPONSE
@@ -1,19 +1,24 @@
 from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks, HTTPException, Request, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from typing import Dict, Any, Optional
 import fitz  # PyMuPDF
 import uvicorn
-from openai import OpenAI
+from openai import AsyncOpenAI
 import os
 import sqlite3
-import json
+import orjson
 import httpx
 import logging
 import time
 import traceback
 from dotenv import load_dotenv
-import uuid
+import secrets
+import shutil
+import asyncio
+import queue
+from contextlib import contextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 
 
@@ -27,24 +32,120 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Document Parser Service", version="1.1.0")
+load_dotenv()
+
+app = FastAPI(title="Document Parser Service", version="1.1.0", default_response_class=ORJSONResponse)
+
+# Comma-separated list of browser origins allowed to call this service
+ALLOWED_ORIGINS = [o.strip() for o in os.getenv("FRONTEND_ORIGIN", "http://localhost:3000").split(",") if o.strip()]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # allow only internal IP address in production
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["authorization", "content-type"],
+    max_age=86400,  # let browsers cache preflight responses for a day
 )
+# List and parse responses carry raw text and nested JSON; compress anything over 1 KB
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 
-# Load environment and initialize OpenAI client
-load_dotenv()
-client = OpenAI()
+# Initialize OpenAI client
+client = AsyncOpenAI()
 EMBEDDING_URL = os.getenv("EMBEDDING_SERVICE_URL", "http://localhost:8002/embed")
+EMBEDDING_BATCH_URL = os.getenv("EMBEDDING_BATCH_URL", EMBEDDING_URL.rstrip("/") + "/batch")
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
+EMBED_BATCH_IN_FLIGHT = int(os.getenv("EMBED_BATCH_IN_FLIGHT", "8"))
+
+# Long-lived client so connections to the embedding service are kept alive and reused
+embedding_http: httpx.AsyncClient = None
+
+
+@app.on_event("startup")
+async def open_http_client():
+    global embedding_http
+    embedding_http = httpx.AsyncClient(
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await embedding_http.aclose()
+
+
+class EmbeddingBatcher:
+    """Coalesces embed payloads from concurrent parse requests into one /embed/batch POST."""
+
+    def __init__(self, batch_size=32, flush_interval=0.05, max_in_flight=EMBED_BATCH_IN_FLIGHT):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue()
+        # Several POSTs may be outstanding at once; collection keeps going while they are pending
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._flushes = set()
+
+    async def submit(self, payload):
+        # Resolves with this payload's {"status_code", "body"} slice of the batch response
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((payload, fut))
+        return await fut
+
+    async def _flush(self, batch):
+        try:
+            response = await embedding_http.post(
+                EMBEDDING_BATCH_URL, json={"items": [payload for payload, _ in batch]}
+            )
+            response.raise_for_status()
+            results = response.json()["results"]
+            if len(results) != len(batch):
+                raise ValueError(f"Embedding service returned {len(results)} results for {len(batch)} items")
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        finally:
+            # Even on cancellation, no caller is left waiting on an unresolved future
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(RuntimeError("Embedding batch flush did not complete"))
+            self._slots.release()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+
+embedding_batcher = EmbeddingBatcher()
+
+
+@app.on_event("startup")
+async def start_embedding_batcher():
+    app.state.embedding_batcher = asyncio.create_task(embedding_batcher.run())
+
 
 # Startup validation
 def validate_startup():
@@ -60,14 +161,24 @@ def validate_startup():
 validate_startup()
 
 
+DB_PATH = "parser_cache.db"
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", os.cpu_count() or 4))
+
+
 # initialize SQLite DB with file_path
 def init_database():
-    db_path = "parser_cache.db"
-
-    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     cursor = conn.cursor()
-
-    cursor.execute('''
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA cache_size=-20000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+
+    # All DDL in one transaction: atomic schema creation, one journal sync on first boot
+    cursor.executescript('''
+        BEGIN;
         CREATE TABLE IF NOT EXISTS job_posts (
             id TEXT PRIMARY KEY,
             file_path TEXT,
@@ -76,62 +187,120 @@ def init_database():
             company_id TEXT,
             recruiter_id TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    cursor.execute('''
+        );
         CREATE TABLE IF NOT EXISTS company_profiles (
             id TEXT PRIMARY KEY,
             file_path TEXT,
             raw_text TEXT,
             parsed_json TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    cursor.execute('''
+        );
         CREATE TABLE IF NOT EXISTS candidate_job_map (
-        candidate_id TEXT,
-        job_id TEXT,
-        file_path TEXT,
-        resume_text TEXT,
-        parsed_resume TEXT,
-        email TEXT,
-        name TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY (candidate_id, job_id)
-        )
+            candidate_id TEXT,
+            job_id TEXT,
+            file_path TEXT,
+            resume_text TEXT,
+            parsed_resume TEXT,
+            email TEXT,
+            name TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (candidate_id, job_id)
+        );
+        -- Lookups by candidate_id are already served by the primary key
+        CREATE INDEX IF NOT EXISTS idx_job_posts_recruiter ON job_posts(recruiter_id, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_cjm_job ON candidate_job_map(job_id);
+        COMMIT;
     ''')
-    conn.commit()
+    # Fresh planner statistics at startup; analysis_limit keeps ANALYZE to sampled index pages
+    cursor.execute("PRAGMA analysis_limit=400")
+    cursor.execute("ANALYZE")
     logger.info("Database initialized with file_path support.")
     return conn
 
-conn = init_database()
+def open_read_connection():
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+# SQLite allows one writer at a time; under WAL, readers never block on it.
+writer_pool = queue.Queue(maxsize=1)
+writer_pool.put(init_database())
+reader_pool = queue.Queue(maxsize=READ_POOL_SIZE)
+for _ in range(READ_POOL_SIZE):
+    reader_pool.put(open_read_connection())
+
+
+@contextmanager
+def write_conn():
+    conn = writer_pool.get()
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        writer_pool.put(conn)
+
+
+@contextmanager
+def read_conn():
+    conn = reader_pool.get()
+    try:
+        yield conn
+    finally:
+        reader_pool.put(conn)
+
+
+def _copy_upload(src, file_path: str):
+    # Copy the spooled upload to disk 1 MiB at a time rather than reading it whole into memory
+    src.seek(0)
+    with open(file_path, "wb") as f:
+        shutil.copyfileobj(src, f, 1 << 20)
 
 
 # Utility: Save uploaded file
 async def save_uploaded_file(file: UploadFile, folder: str = UPLOAD_DIR) -> str:
     os.makedirs(folder, exist_ok=True)
-    # UUID for file uniqueness and traceability
-    file_id = str(uuid.uuid4())
+    # Random 64-bit prefix for file uniqueness and traceability
+    file_id = secrets.token_hex(8)
     file_path = os.path.join(folder, f"{file_id}_{file.filename}")
-    contents = await file.read()
-    with open(file_path, "wb") as f:
-        f.write(contents)
+    await asyncio.to_thread(_copy_upload, file.file, file_path)
     logger.info(f"Saved uploaded file to {file_path}")
-    return file_path, contents
+    return file_path
+
+
 
+# PyMuPDF's default flags for "text" extraction (already excludes image blocks)
+TEXT_FLAGS = fitz.TEXTFLAGS_TEXT
+SCANNED_PDF_PROBE_PAGES = 2
 
 
-# PDF to text
-async def extract_text_from_pdf(contents: bytes) -> str:
+def _pdf_to_text(file_path: str) -> str:
+    doc = fitz.open(file_path, filetype="pdf")
     try:
-        doc = fitz.open(stream=contents, filetype="pdf")
         if doc.page_count == 0:
             raise ValueError("PDF has no pages")
-        text = ""
+        parts = []
+        seen_text = False
         for page_num in range(doc.page_count):
-            page = doc[page_num]
-            text += page.get_text()
+            page_text = doc[page_num].get_text("text", sort=False, flags=TEXT_FLAGS)
+            parts.append(page_text)
+            seen_text = seen_text or bool(page_text.strip())
+            # Image-only leading pages almost always mean a scanned PDF; don't decode the rest
+            if not seen_text and page_num + 1 >= SCANNED_PDF_PROBE_PAGES:
+                raise ValueError("No text found in the first pages (likely scanned PDF, OCR required)")
+        return "".join(parts)
+    finally:
         doc.close()
+
+
+# PDF to text (PyMuPDF parsing is CPU-bound, so it runs in a worker thread)
+async def extract_text_from_pdf(file_path: str) -> str:
+    try:
+        text = await asyncio.to_thread(_pdf_to_text, file_path)
         if not text.strip():
             raise ValueError("No text could be extracted from PDF")
         logger.info(f"Extracted {len(text)} characters from PDF")
@@ -142,37 +311,74 @@ async def extract_text_from_pdf(contents: bytes) -> str:
 
 
 
+# Single-row write on the writer connection; called via asyncio.to_thread
+def _persist_row(sql: str, params: tuple):
+    with write_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(sql, params)
+        conn.commit()
+
+
+
 # Embedding service call
-async def send_to_embedding_service(id: str, chunks: list[str], role: str, source_type: str):
+EMBED_SUB_BATCH = int(os.getenv("EMBED_SUB_BATCH", "32"))
+EMBED_SUB_BATCH_CONCURRENCY = int(os.getenv("EMBED_SUB_BATCH_CONCURRENCY", "5"))
+
+
+async def _post_embed(payload: dict, batched: bool):
+    if batched:
+        item = await embedding_batcher.submit(payload)
+        return item["status_code"], item["body"]
+    # Direct call for latency-sensitive callers that shouldn't wait on a flush
+    response = await embedding_http.post(EMBEDDING_URL, json=payload)
+    return response.status_code, response.json() if response.status_code == 200 else response.text
+
+
+async def send_to_embedding_service(id: str, chunks: list[str], role: str, source_type: str, batched: bool = True):
     try:
         filtered_chunks = [chunk.strip() for chunk in chunks if chunk and chunk.strip()]
         if not filtered_chunks:
             logger.warning(f"[Embedding] No valid chunks to embed for {source_type} ID: {id}")
             return {"success": False, "error": "No valid chunks to embed"}
-        payload = {
-            "type": source_type,
-            "id": id,
-            "role": role,
-            "chunks": filtered_chunks
-        }
         logger.info(f"[Embedding] Starting embedding for {source_type} ID: {id} with {len(filtered_chunks)} chunks")
-        async with httpx.AsyncClient(timeout=30.0) as http_client:
-            response = await http_client.post(EMBEDDING_URL, json=payload)
-            logger.info(f"[Embedding] Response status: {response.status_code} for {source_type} ID: {id}")
-            if response.status_code == 200:
-                result = response.json()
-                embedded_ids = result.get("embedded_ids", [])
-                error_count = sum(1 for _id in embedded_ids if str(_id).startswith("error:"))
-                if error_count > 0:
-                    logger.error(f"[Embedding] {error_count}/{len(embedded_ids)} embeddings failed for {source_type} ID: {id}")
-                    return {"success": False, "error": f"{error_count} embeddings failed", "details": result}
-                else:
-                    logger.info(f"[Embedding] All {len(embedded_ids)} embeddings successful for {source_type} ID: {id}")
-                    return {"success": True, "embedded_count": len(embedded_ids)}
-            else:
-                error_msg = f"HTTP {response.status_code}: {response.text}"
+
+        # Large chunk lists go out as several smaller requests, a few at a time;
+        # start_index keeps chunk_index metadata global across sub-batches.
+        # Split documents post their sub-batches directly: routed through the batcher
+        # they would just be coalesced back into one request and lose the parallelism.
+        starts = range(0, len(filtered_chunks), EMBED_SUB_BATCH)
+        via_batcher = batched and len(starts) == 1
+        sem = asyncio.Semaphore(EMBED_SUB_BATCH_CONCURRENCY)
+
+        async def post_sub_batch(start: int):
+            payload = {
+                "type": source_type,
+                "id": id,
+                "role": role,
+                "chunks": filtered_chunks[start:start + EMBED_SUB_BATCH],
+                "start_index": start
+            }
+            async with sem:
+                return await _post_embed(payload, via_batcher)
+
+        responses = await asyncio.gather(*[post_sub_batch(start) for start in starts])
+
+        embedded_ids = []
+        for status_code, result in responses:
+            logger.info(f"[Embedding] Response status: {status_code} for {source_type} ID: {id}")
+            if status_code != 200:
+                error_msg = f"HTTP {status_code}: {result}"
                 logger.error(f"[Embedding] {error_msg} for {source_type} ID: {id}")
                 return {"success": False, "error": error_msg}
+            embedded_ids.extend(result.get("embedded_ids", []))
+
+        error_count = sum(1 for _id in embedded_ids if str(_id).startswith("error:"))
+        if error_count > 0:
+            logger.error(f"[Embedding] {error_count}/{len(embedded_ids)} embeddings failed for {source_type} ID: {id}")
+            return {"success": False, "error": f"{error_count} embeddings failed", "details": {"embedded_ids": embedded_ids}}
+        logger.info(f"[Embedding] All {len(embedded_ids)} embeddings successful for {source_type} ID: {id}")
+        return {"success": True, "embedded_count": len(embedded_ids)}
     except Exception as e:
         error_msg = f"Unexpected error: {str(e)}"
         logger.error(f"[Embedding] {error_msg}")
@@ -181,26 +387,138 @@ async def send_to_embedding_service(id: str, chunks: list[str], role: str, sourc
 
 
 
-def parse_with_openai(prompt: str, model: str = "gpt-4o", use_json_mode: bool = False) -> Dict[str, Any]:
+# Which parsed fields get embedded, per source type. "[*]" walks a list (or takes a lone
+# value as-is); str fields become one chunk each, list fields one space-joined chunk.
+CHUNK_SPECS = {
+    "resume": [
+        ("work_experience[*].responsibilities", str),
+        ("projects[*].description", str),
+        ("skills[*]", str),
+    ],
+    "job_post": [
+        ("job_description", str),
+        ("key_responsibilities", str),
+    ],
+    "company_profile": [
+        ("mission", str),
+        ("vision", str),
+        ("core_values", list),
+        ("culture_summary", str),
+    ],
+}
+
+
+def _walk(node, keys):
+    if not keys:
+        yield node
+        return
+    key, rest = keys[0], keys[1:]
+    if key.endswith("[*]"):
+        value = node.get(key[:-3]) if isinstance(node, dict) else None
+        for item in value if isinstance(value, list) else [value]:
+            yield from _walk(item, rest)
+    elif isinstance(node, dict):
+        yield from _walk(node.get(key), rest)
+
+
+def build_chunks(parsed_json: dict, spec: list) -> list[str]:
+    chunks = []
+    for path, kind in spec:
+        for value in _walk(parsed_json, path.split(".")):
+            if kind is list:
+                value = " ".join(str(v) for v in value if v) if isinstance(value, list) else None
+            if isinstance(value, str) and value.strip():
+                chunks.append(value)
+    return chunks
+
+
+def preview_text(text: str, limit: int = 500) -> str:
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+# Prompt templates; only {text} varies per request
+PROMPT_RESUME = """Extract the following information from this resume and return as JSON:
+{{
+"full_name": "string",
+"education": [
+    {{
+    "institution": "string",
+    "degree": "string", 
+    "year": "string"
+    }}
+],
+"work_experience": [
+    {{
+    "company": "string",
+    "title": "string",
+    "duration": "string",
+    "responsibilities": "string"
+    }}
+],
+"skills": ["array of strings"],
+"tools": ["array of strings"],
+"projects": [
+    {{
+    "name": "string",
+    "tech_stack": ["array of strings"],
+    "description": "string"
+    }}
+]
+}}
+Resume text:
+{text}
+"""
+
+PROMPT_JOB = """Extract the following information from this job posting and return as JSON:
+{{
+"job_title": "string",
+"employment_type": "string",
+"location": "string",
+"required_skills": ["array of strings"],
+"preferred_skills": ["array of strings"],
+"job_description": "string",
+"key_responsibilities": "string"
+}}
+Job posting text:
+{text}
+"""
+
+PROMPT_COMPANY = """Extract the following information from this company profile and return as JSON:
+{{
+"company_name": "string",
+"industry": "string",
+"mission": "string",
+"vision": "string",
+"core_values": ["array of strings"],
+"culture_summary": "string"
+}}
+Company profile text:
+{text}
+"""
+
+SYSTEM_MSG = {"role": "system", "content": "You are an AI document parser that extracts structured information."}
+
+
+async def parse_with_openai(prompt: str, model: str = "gpt-4o", use_json_mode: bool = False) -> Dict[str, Any]:
     try:
         request_params = {
             "model": model,
             "messages": [
-                {"role": "system", "content": "You are an AI document parser that extracts structured information."},
+                SYSTEM_MSG,
                 {"role": "user", "content": prompt}
             ]
         }
         if use_json_mode:
             request_params["response_format"] = {"type": "json_object"}
-        result = client.chat.completions.create(**request_params)
+        result = await client.chat.completions.create(**request_params)
         if not result.choices or not result.choices[0].message.content:
             raise ValueError("Empty response from OpenAI")
         content = result.choices[0].message.content.strip()
         if use_json_mode:
             try:
-                parsed_json = json.loads(content)
+                parsed_json = orjson.loads(content)
                 return {"success": True, "content": content, "parsed_json": parsed_json}
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 logger.error(f"JSON parsing failed despite JSON mode: {e}")
                 return {"success": False, "error": f"Invalid JSON response: {str(e)}", "raw_content": content}
         return {"success": True, "content": content}
@@ -224,80 +542,28 @@ async def parse_resume(
 ) -> Dict:
     logger.info(f"[Resume] Starting parse for candidate: {candidate_id}, job: {job_id}")
     try:
-        file_path, contents = await save_uploaded_file(file)
-        text = await extract_text_from_pdf(contents)
-        prompt = f"""
-        Extract the following information from this resume and return as JSON:
-        {{
-        "full_name": "string",
-        "education": [
-            {{
-            "institution": "string",
-            "degree": "string", 
-            "year": "string"
-            }}
-        ],
-        "work_experience": [
-            {{
-            "company": "string",
-            "title": "string",
-            "duration": "string",
-            "responsibilities": "string"
-            }}
-        ],
-        "skills": ["array of strings"],
-        "tools": ["array of strings"],
-        "projects": [
-            {{
-            "name": "string",
-            "tech_stack": ["array of strings"],
-            "description": "string"
-            }}
-        ]
-        }}
-        Resume text:
-        {text}
-        """
-        parse_result = parse_with_openai(prompt, model="gpt-4o", use_json_mode=True)
+        file_path = await save_uploaded_file(file)
+        text = await extract_text_from_pdf(file_path)
+        prompt = PROMPT_RESUME.format_map({"text": text})
+        parse_result = await parse_with_openai(prompt, model="gpt-4o", use_json_mode=True)
         if not parse_result["success"]:
             logger.error(f"[Resume] Parsing failed for candidate: {candidate_id}")
             raise HTTPException(status_code=500, detail=f"Resume parsing failed: {parse_result['error']}")
         parsed_content = parse_result["content"]
         parsed_json = parse_result.get("parsed_json", {})
 
-        # Save to database
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT OR REPLACE INTO candidate_job_map (candidate_id, job_id, file_path, resume_text, parsed_resume, email, name) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (candidate_id, job_id, file_path, text, parsed_content, email, name)
-            )
-            conn.commit()
-            logger.info(f"[Resume] Saved to database for candidate: {candidate_id}")
-        except Exception as e:
-            logger.error(f"[Resume] Database save failed: {str(e)}")
-
+        # Save to database while the embedding request is in flight
+        db_task = asyncio.create_task(asyncio.to_thread(
+            _persist_row,
+            "INSERT OR REPLACE INTO candidate_job_map (candidate_id, job_id, file_path, resume_text, parsed_resume, email, name) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (candidate_id, job_id, file_path, text, parsed_content, email, name)
+        ))
 
         # Prepare embedding chunks
         embed_chunks = []
         embedding_result = {"success": False, "error": "No embedding attempted"}
         try:
-            if "work_experience" in parsed_json:
-                for exp in parsed_json["work_experience"]:
-                    responsibilities = exp.get("responsibilities", "")
-                    if responsibilities and isinstance(responsibilities, str):
-                        embed_chunks.append(responsibilities)
-            if "projects" in parsed_json:
-                for proj in parsed_json["projects"]:
-                    description = proj.get("description", "")
-                    if description and isinstance(description, str):
-                        embed_chunks.append(description)
-            if "skills" in parsed_json:
-                skills = parsed_json["skills"]
-                if isinstance(skills, list):
-                    embed_chunks.extend([skill for skill in skills if skill and isinstance(skill, str)])
-                elif isinstance(skills, str):
-                    embed_chunks.append(skills)
+            embed_chunks = build_chunks(parsed_json, CHUNK_SPECS["resume"])
             logger.info(f"[Resume] Prepared {len(embed_chunks)} chunks for embedding")
             if embed_chunks:
                 embedding_result = await send_to_embedding_service(candidate_id, embed_chunks, "", "resume")
@@ -307,19 +573,26 @@ async def parse_resume(
             logger.error(f"[Resume] Embedding preparation failed: {str(e)}")
             embedding_result = {"success": False, "error": f"Embedding failed: {str(e)}"}
 
+        try:
+            await db_task
+            logger.info(f"[Resume] Saved to database for candidate: {candidate_id}")
+        except Exception as e:
+            logger.error(f"[Resume] Database save failed: {str(e)}")
+
         response = {
             "success": True,
             "candidate_id": candidate_id,
             "job_id": job_id,
             "file_path": file_path,
-            "raw_text": text[:500] + "..." if len(text) > 500 else text,
+            "raw_text": preview_text(text),
             "parsed_resume": parsed_json,
             "embedding_result": embedding_result,
             "text_length": len(text),
             "chunks_prepared": len(embed_chunks)
         }
         logger.info(f"[Resume] Successfully processed candidate: {candidate_id}")
-        return response
+        # Already plain JSON types, so skip jsonable_encoder and serialize with orjson directly
+        return ORJSONResponse(response)
     except HTTPException:
         raise
     except Exception as e:
@@ -340,51 +613,28 @@ async def parse_job_post(
     ) -> Dict:
     logger.info(f"[Job Post] Starting parse for job: {job_id}")
     try:
-        file_path, contents = await save_uploaded_file(file)
-        text = await extract_text_from_pdf(contents)
-        prompt = f"""
-        Extract the following information from this job posting and return as JSON:
-        {{
-        "job_title": "string",
-        "employment_type": "string",
-        "location": "string",
-        "required_skills": ["array of strings"],
-        "preferred_skills": ["array of strings"],
-        "job_description": "string",
-        "key_responsibilities": "string"
-        }}
-        Job posting text:
-        {text}
-        """
-        parse_result = parse_with_openai(prompt, model="gpt-4o", use_json_mode=True)
+        file_path = await save_uploaded_file(file)
+        text = await extract_text_from_pdf(file_path)
+        prompt = PROMPT_JOB.format_map({"text": text})
+        parse_result = await parse_with_openai(prompt, model="gpt-4o", use_json_mode=True)
         if not parse_result["success"]:
             logger.error(f"[Job Post] Parsing failed for job: {job_id}")
             raise HTTPException(status_code=500, detail=f"Job post parsing failed: {parse_result['error']}")
         parsed_content = parse_result["content"]
         parsed_json = parse_result.get("parsed_json", {})
 
-        # Save to database
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT OR REPLACE INTO job_posts (id, file_path, raw_text, parsed_json, company_id, recruiter_id) VALUES (?, ?, ?, ?, ?, ?)",
-                (job_id, file_path, text, parsed_content, company_id, recruiter_id)
-            )
-            conn.commit()
-            logger.info(f"[Job Post] Saved to database for job: {job_id}")
-        except Exception as e:
-            logger.error(f"[Job Post] Database save failed: {str(e)}")
+        # Save to database while the embedding request is in flight
+        db_task = asyncio.create_task(asyncio.to_thread(
+            _persist_row,
+            "INSERT OR REPLACE INTO job_posts (id, file_path, raw_text, parsed_json, company_id, recruiter_id) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, file_path, text, parsed_content, company_id, recruiter_id)
+        ))
 
         # Prepare embedding chunks
         embed_chunks = []
         embedding_result = {"success": False, "error": "No embedding attempted"}
         try:
-            job_desc = parsed_json.get("job_description", "")
-            if job_desc and isinstance(job_desc, str):
-                embed_chunks.append(job_desc)
-            key_resp = parsed_json.get("key_responsibilities", "")
-            if key_resp and isinstance(key_resp, str):
-                embed_chunks.append(key_resp)
+            embed_chunks = build_chunks(parsed_json, CHUNK_SPECS["job_post"])
             logger.info(f"[Job Post] Prepared {len(embed_chunks)} chunks for embedding")
             if embed_chunks:
                 embedding_result = await send_to_embedding_service(job_id, embed_chunks, "", "job_post")
@@ -394,18 +644,25 @@ async def parse_job_post(
             logger.error(f"[Job Post] Embedding preparation failed: {str(e)}")
             embedding_result = {"success": False, "error": f"Embedding failed: {str(e)}"}
 
+        try:
+            await db_task
+            logger.info(f"[Job Post] Saved to database for job: {job_id}")
+        except Exception as e:
+            logger.error(f"[Job Post] Database save failed: {str(e)}")
+
         response = {
             "success": True,
             "job_id": job_id,
             "file_path": file_path,
-            "raw_text": text[:500] + "..." if len(text) > 500 else text,
+            "raw_text": preview_text(text),
             "parsed_job_post": parsed_json,
             "embedding_result": embedding_result,
             "text_length": len(text),
             "chunks_prepared": len(embed_chunks)
         }
         logger.info(f"[Job Post] Successfully processed job: {job_id}")
-        return response
+        # Already plain JSON types, so skip jsonable_encoder and serialize with orjson directly
+        return ORJSONResponse(response)
     except HTTPException:
         raise
     except Exception as e:
@@ -424,58 +681,28 @@ async def parse_company_profile(
     ) -> Dict:
     logger.info(f"[Company] Starting parse for company: {company_id}")
     try:
-        file_path, contents = await save_uploaded_file(file)
-        text = await extract_text_from_pdf(contents)
-        prompt = f"""
-        Extract the following information from this company profile and return as JSON:
-        {{
-        "company_name": "string",
-        "industry": "string",
-        "mission": "string",
-        "vision": "string",
-        "core_values": ["array of strings"],
-        "culture_summary": "string"
-        }}
-        Company profile text:
-        {text}
-        """
-        parse_result = parse_with_openai(prompt, model="gpt-4o", use_json_mode=True)
+        file_path = await save_uploaded_file(file)
+        text = await extract_text_from_pdf(file_path)
+        prompt = PROMPT_COMPANY.format_map({"text": text})
+        parse_result = await parse_with_openai(prompt, model="gpt-4o", use_json_mode=True)
         if not parse_result["success"]:
             logger.error(f"[Company] Parsing failed for company: {company_id}")
             raise HTTPException(status_code=500, detail=f"Company profile parsing failed: {parse_result['error']}")
         parsed_content = parse_result["content"]
         parsed_json = parse_result.get("parsed_json", {})
 
-        # Save to database
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT OR REPLACE INTO company_profiles (id, file_path, raw_text, parsed_json) VALUES (?, ?, ?, ?)",
-                (company_id, file_path, text, parsed_content)
-            )
-            conn.commit()
-            logger.info(f"[Company] Saved to database for company: {company_id}")
-        except Exception as e:
-            logger.error(f"[Company] Database save failed: {str(e)}")
+        # Save to database while the embedding request is in flight
+        db_task = asyncio.create_task(asyncio.to_thread(
+            _persist_row,
+            "INSERT OR REPLACE INTO company_profiles (id, file_path, raw_text, parsed_json) VALUES (?, ?, ?, ?)",
+            (company_id, file_path, text, parsed_content)
+        ))
 
         # Prepare embedding chunks
         embed_chunks = []
         embedding_result = {"success": False, "error": "No embedding attempted"}
         try:
-            mission = parsed_json.get("mission", "")
-            if mission and isinstance(mission, str):
-                embed_chunks.append(mission)
-            vision = parsed_json.get("vision", "")
-            if vision and isinstance(vision, str):
-                embed_chunks.append(vision)
-            core_values = parsed_json.get("core_values", [])
-            if core_values and isinstance(core_values, list):
-                core_values_text = " ".join([str(val) for val in core_values if val])
-                if core_values_text.strip():
-                    embed_chunks.append(core_values_text)
-            culture_summary = parsed_json.get("culture_summary", "")
-            if culture_summary and isinstance(culture_summary, str):
-                embed_chunks.append(culture_summary)
+            embed_chunks = build_chunks(parsed_json, CHUNK_SPECS["company_profile"])
             logger.info(f"[Company] Prepared {len(embed_chunks)} chunks for embedding")
             if embed_chunks:
                 embedding_result = await send_to_embedding_service(company_id, embed_chunks, "", "company_profile")
@@ -485,18 +712,25 @@ async def parse_company_profile(
             logger.error(f"[Company] Embedding preparation failed: {str(e)}")
             embedding_result = {"success": False, "error": f"Embedding failed: {str(e)}"}
 
+        try:
+            await db_task
+            logger.info(f"[Company] Saved to database for company: {company_id}")
+        except Exception as e:
+            logger.error(f"[Company] Database save failed: {str(e)}")
+
         response = {
             "success": True,
             "company_id": company_id,
             "file_path": file_path,
-            "raw_text": text[:500] + "..." if len(text) > 500 else text,
+            "raw_text": preview_text(text),
             "parsed_company_profile": parsed_json,
             "embedding_result": embedding_result,
             "text_length": len(text),
             "chunks_prepared": len(embed_chunks)
         }
         logger.info(f"[Company] Successfully processed company: {company_id}")
-        return response
+        # Already plain JSON types, so skip jsonable_encoder and serialize with orjson directly
+        return ORJSONResponse(response)
     except HTTPException:
         raise
     except Exception as e:
@@ -507,34 +741,33 @@ async def parse_company_profile(
 
 
 
+# Pull single fields out of the stored JSON inside SQLite instead of json.loads per row;
+# json_valid guards keep one malformed blob from failing the whole query
+SQL_JOB_TITLE = "COALESCE(CASE WHEN json_valid(parsed_json) THEN json_extract(parsed_json, '$.job_title') END, '')"
+SQL_COMPANY_NAME = "COALESCE(CASE WHEN json_valid(parsed_json) THEN json_extract(parsed_json, '$.company_name') END, '')"
+SQL_CANDIDATE_NAME = (
+    "COALESCE(NULLIF(CASE WHEN json_valid(parsed_resume) THEN json_extract(parsed_resume, '$.full_name') END, ''), name, '')"
+)
+
+
 @app.get("/jobs")
 def get_jobs(recruiter_id: Optional[str] = Query(None)):
-    cursor = conn.cursor()
-    if recruiter_id:
-        cursor.execute(
-            "SELECT id, file_path, parsed_json, created_at FROM job_posts WHERE recruiter_id = ? ORDER BY created_at DESC",
-            (recruiter_id,)
-        )
-    else:
-        cursor.execute(
-            "SELECT id, file_path, parsed_json, created_at FROM job_posts ORDER BY created_at DESC"
-        )
-    rows = cursor.fetchall()
-    jobs = []
-    for r in rows:
-        # try to extract job title if present in parsed_json
-        title = ""
-        try:
-            j = json.loads(r[2]) if r[2] else {}
-            title = j.get("job_title") or ""
-        except Exception:
-            title = ""
-        jobs.append({
-            "job_id": r[0],
-            "file_path": r[1],
-            "title": title,
-            "created_at": r[3]
-        })
+    with read_conn() as conn:
+        cursor = conn.cursor()
+        if recruiter_id:
+            cursor.execute(
+                f"SELECT id, file_path, {SQL_JOB_TITLE}, created_at FROM job_posts WHERE recruiter_id = ? ORDER BY created_at DESC",
+                (recruiter_id,)
+            )
+        else:
+            cursor.execute(
+                f"SELECT id, file_path, {SQL_JOB_TITLE}, created_at FROM job_posts ORDER BY created_at DESC"
+            )
+        rows = cursor.fetchall()
+    jobs = [
+        {"job_id": r[0], "file_path": r[1], "title": r[2], "created_at": r[3]}
+        for r in rows
+    ]
     return {"jobs": jobs}
 
 
@@ -542,84 +775,57 @@ def get_jobs(recruiter_id: Optional[str] = Query(None)):
 # --- GET Company Profile---
 @app.get("/company_profiles")
 def get_company_profiles():
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, file_path, parsed_json, created_at FROM company_profiles ORDER BY created_at DESC")
-    rows = cursor.fetchall()
-    profiles = []
-    for r in rows:
-        # try to extract company name if present
-        company_name = ""
-        try:
-            j = json.loads(r[2]) if r[2] else {}
-            company_name = j.get("company_name") or ""
-        except Exception:
-            company_name = ""
-        profiles.append({
-            "company_id": r[0],
-            "file_path": r[1],
-            "company_name": company_name,
-            "created_at": r[3]
-        })
+    with read_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id, file_path, {SQL_COMPANY_NAME}, created_at FROM company_profiles ORDER BY created_at DESC")
+        rows = cursor.fetchall()
+    profiles = [
+        {"company_id": r[0], "file_path": r[1], "company_name": r[2], "created_at": r[3]}
+        for r in rows
+    ]
     return {"company_profiles": profiles}
 
 
 
 @app.get("/candidates_for_job")
 def candidates_for_job(job_id: str):
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT candidate_id, file_path, parsed_resume, email, name, created_at FROM candidate_job_map WHERE job_id=?",
-        (job_id,)
-    )
-    rows = cursor.fetchall()
-    candidates = []
-    for r in rows:
-        candidate_id = r[0]
-        email = r[3] or ""
-        name = r[4] or ""
-        try:
-            parsed = json.loads(r[2]) if r[2] else {}
-            full_name = parsed.get("full_name", "") or name
-        except Exception:
-            full_name = name
-        candidates.append({
-            "candidate_id": candidate_id,
-            "candidate_name": full_name,
-            "candidate_email": email,
+    with read_conn() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT candidate_id, file_path, {SQL_CANDIDATE_NAME}, COALESCE(email, ''), created_at FROM candidate_job_map WHERE job_id=?",
+            (job_id,)
+        )
+        rows = cursor.fetchall()
+    candidates = [
+        {
+            "candidate_id": r[0],
+            "candidate_name": r[2],
+            "candidate_email": r[3],
             "resume_file_path": r[1],
-            "applied_at": r[5]
-        })
+            "applied_at": r[4]
+        }
+        for r in rows
+    ]
     return {"candidates": candidates}
 
 
 
 @app.get("/applications_for_candidate")
 def applications_for_candidate(candidate_id: str):
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT job_id, file_path, created_at, parsed_resume FROM candidate_job_map WHERE candidate_id=?",
-        (candidate_id,)
-    )
-    rows = cursor.fetchall()
-    applications = []
-    for r in rows:
-        # parse job_title from job_posts
-        try:
-            job_id = r[0]
-            cursor.execute("SELECT parsed_json FROM job_posts WHERE id=?", (job_id,))
-            job_row = cursor.fetchone()
-            job_title = ""
-            if job_row:
-                job_json = json.loads(job_row[0]) if job_row[0] else {}
-                job_title = job_json.get("job_title", "")
-        except Exception:
-            job_title = ""
-        applications.append({
-            "job_id": job_id,
-            "job_title": job_title,
-            "resume_file_path": r[1],
-            "applied_at": r[2]
-        })
+    with read_conn() as conn:
+        cursor = conn.cursor()
+        # job_posts has the only parsed_json column, so SQL_JOB_TITLE resolves against j
+        cursor.execute(
+            f"""SELECT m.job_id, m.file_path, m.created_at, {SQL_JOB_TITLE}
+                FROM candidate_job_map m LEFT JOIN job_posts j ON j.id = m.job_id
+                WHERE m.candidate_id=?""",
+            (candidate_id,)
+        )
+        rows = cursor.fetchall()
+    applications = [
+        {"job_id": r[0], "job_title": r[3], "resume_file_path": r[1], "applied_at": r[2]}
+        for r in rows
+    ]
     return {"applications": applications}
 
 
@@ -628,8 +834,8 @@ def applications_for_candidate(candidate_id: str):
 @app.get("/health")
 def health():
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1")
+        with read_conn() as conn:
+            conn.execute("SELECT 1")
         db_status = "healthy"
     except Exception as e:
         db_status = f"error: {str(e)}"
@@ -2,8 +2,14 @@ from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, ValidationError
 from typing import List, Optional
-from openai import OpenAI
+from openai import AsyncOpenAI
 import uuid
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import numpy as np
 import os
 import chromadb
 from chromadb.config import Settings
@@ -29,16 +35,32 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Chunks per embeddings.create call; the API takes up to 2048 inputs per request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+# Concurrent embeddings.create calls per request, to stay inside rate limits
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# Shared by all embed_text calls, so concurrent /embed/batch items can't multiply the OpenAI fan-out
+embed_semaphore = asyncio.Semaphore(EMBED_CONCURRENCY)
+# Rows per collection.add call; Chroma commits once per call
+CHROMA_ADD_BATCH = int(os.getenv("CHROMA_ADD_BATCH", "250"))
+# Side table of already-computed vectors keyed by sha256(text) + model
+EMBED_CACHE_DB = os.getenv("EMBED_CACHE_DB", "embedding_cache.db")
+
+
 # Global variables for clients
 openai_client = None
 chroma_client = None
 collection = None
+cache_conn = None
+# cache_conn is shared by the to_thread workers that read and write the cache
+cache_lock = threading.Lock()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
-    global openai_client, chroma_client, collection
+    global openai_client, chroma_client, collection, cache_conn
     
     try:
         # Startup
@@ -50,7 +72,7 @@ async def lifespan(app: FastAPI):
             logger.error("OPENAI_API_KEY not found in environment variables")
             raise ValueError("OPENAI_API_KEY is required")
         
-        openai_client = OpenAI(api_key=api_key)
+        openai_client = AsyncOpenAI(api_key=api_key)
         logger.info("OpenAI client initialized successfully")
         
         # Initialize ChromaDB client
@@ -60,6 +82,10 @@ async def lifespan(app: FastAPI):
         chroma_client = chromadb.PersistentClient(path=chroma_path)
         collection = chroma_client.get_or_create_collection(name="interview_vectors")
         logger.info(f"ChromaDB client initialized successfully at {chroma_path}")
+
+        cache_conn = init_embedding_cache()
+        backfill_stats()
+        logger.info(f"Embedding cache initialized at {EMBED_CACHE_DB}")
         
         # Test connections
         await test_connections()
@@ -96,6 +122,7 @@ class EmbedChunk(BaseModel):
     id: str    # candidate_id or job_id or company_id
     role: Optional[str] = None
     chunks: List[str]  # list of text blocks to embed
+    start_index: int = 0  # offset of chunks[0] when a caller splits a document into sub-batches
     
     class Config:
         # example
@@ -118,14 +145,28 @@ class EmbedResponse(BaseModel):
     failed_chunks_count: int
 
 
+# Last live OpenAI check; /health reports this instead of calling the API on every probe
+OPENAI_CHECK_TTL = 300
+openai_check = {"ok": None, "error": None, "checked_at": 0.0}
+openai_check_task = None
+
+
+async def refresh_openai_check():
+    try:
+        await openai_client.models.list()
+        openai_check.update(ok=True, error=None)
+    except Exception as e:
+        openai_check.update(ok=False, error=str(e))
+    openai_check["checked_at"] = time.time()
+
+
 async def test_connections():
     """Test all service connections"""
     try:
-        # Test OpenAI connection
-        test_response = openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input="test connection"
-        )
+        # Test OpenAI connection (models.list is free, unlike an embedding call)
+        await refresh_openai_check()
+        if not openai_check["ok"]:
+            raise RuntimeError(f"OpenAI connection test failed: {openai_check['error']}")
         logger.info("OpenAI connection test successful")
         
         # Test ChromaDB connection
@@ -171,6 +212,110 @@ def validate_input_data(data: EmbedChunk) -> tuple[bool, str]:
 
 
 
+def init_embedding_cache():
+    conn = sqlite3.connect(EMBED_CACHE_DB, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            vector BLOB NOT NULL,
+            PRIMARY KEY (hash, model)
+        )
+    """)
+    # Running per-(type, role) totals so /stats doesn't have to enumerate the collection
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_stats (
+            type TEXT NOT NULL,
+            role TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (type, role)
+        )
+    """)
+    conn.commit()
+    return conn
+
+
+def read_stats():
+    with cache_lock:
+        type_counts = dict(cache_conn.execute("SELECT type, SUM(count) FROM embedding_stats GROUP BY type"))
+        role_counts = dict(cache_conn.execute("SELECT role, SUM(count) FROM embedding_stats GROUP BY role"))
+    return type_counts, role_counts
+
+
+def backfill_stats():
+    """Seed embedding_stats from an existing collection, paging so memory stays bounded"""
+    if cache_conn.execute("SELECT 1 FROM embedding_stats LIMIT 1").fetchone() or collection.count() == 0:
+        return
+    counts = {}
+    offset = 0
+    while True:
+        page = collection.get(limit=1000, offset=offset, include=["metadatas"])
+        metadatas = page.get("metadatas") or []
+        if not metadatas:
+            break
+        for metadata in metadatas:
+            key = (metadata.get("type", "unknown"), metadata.get("role", "none"))
+            counts[key] = counts.get(key, 0) + 1
+        offset += len(metadatas)
+    cache_conn.executemany(
+        "INSERT INTO embedding_stats (type, role, count) VALUES (?, ?, ?)",
+        [(t, r, n) for (t, r), n in counts.items()]
+    )
+    cache_conn.commit()
+    logger.info(f"Backfilled embedding stats for {offset} existing embeddings")
+
+
+def get_cached_vectors(hashes: List[str]) -> dict:
+    """Return {hash: vector} for the hashes already embedded with EMBEDDING_MODEL"""
+    found = {}
+    unique = list(set(hashes))
+    with cache_lock:
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            rows = cache_conn.execute(
+                f"SELECT hash, vector FROM embedding_cache WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                (EMBEDDING_MODEL, *batch)
+            ).fetchall()
+            for h, blob in rows:
+                found[h] = np.frombuffer(blob, dtype=np.float32)
+    return found
+
+
+def save_embed_results(items: list, doc_type: str, role: str, added: int):
+    """Cache freshly embedded vectors and bump the stats counters in one transaction"""
+    if not items and not added:
+        return
+    # float32 bytes are ~6 KB per vector versus ~20 KB as JSON text
+    rows = [(h, EMBEDDING_MODEL, vector.tobytes()) for h, vector in items]
+    with cache_lock:
+        cache_conn.executemany(
+            "INSERT OR IGNORE INTO embedding_cache (hash, model, vector) VALUES (?, ?, ?)",
+            rows
+        )
+        if added:
+            cache_conn.execute(
+                """
+                INSERT INTO embedding_stats (type, role, count) VALUES (?, ?, ?)
+                ON CONFLICT(type, role) DO UPDATE SET count = count + excluded.count
+                """,
+                (doc_type, role, added)
+            )
+        cache_conn.commit()
+
+
+def chunk_failure(i: int, text_chunk: str, error: Exception) -> dict:
+    logger.error(f"Failed to process chunk {i+1}: {str(error)}")
+    logger.error(traceback.format_exc())
+    return {
+        "chunk_index": i,
+        "error": str(error),
+        "chunk_preview": text_chunk[:100] + "..." if len(text_chunk) > 100 else text_chunk
+    }
+
+
 @app.post("/embed", response_model=EmbedResponse)
 async def embed_text(data: EmbedChunk):
     """Embed text chunks and store in vector database"""
@@ -192,51 +337,97 @@ async def embed_text(data: EmbedChunk):
         
         embedded_ids = []
         failed_chunks = []
-        
-        for i, text_chunk in enumerate(data.chunks):
+
+        # Chunks whose text was embedded before are served from the cache
+        hashes = [hashlib.sha256(chunk.strip().encode()).hexdigest() for chunk in data.chunks]
+        cached = await asyncio.to_thread(get_cached_vectors, hashes)
+        pending = [i for i, h in enumerate(hashes) if h not in cached]
+        logger.info(f"Embedding cache: {len(data.chunks) - len(pending)} hits, {len(pending)} misses for {data.type}:{data.id}")
+
+        # Vectors are kept as float32 ndarrays end to end so Chroma doesn't convert boxed Python floats
+        # Embed misses in batches: one API call per EMBED_BATCH_SIZE chunks instead of one per chunk,
+        # with at most EMBED_CONCURRENCY batch calls in flight across the whole process
+        async def embed_slice(indices):
+            vectors, failures = {}, []
+            async with embed_semaphore:
+                try:
+                    response = await openai_client.embeddings.create(
+                        model=EMBEDDING_MODEL,
+                        input=[data.chunks[i].strip() for i in indices]
+                    )
+                    for item in response.data:
+                        vectors[indices[item.index]] = np.asarray(item.embedding, dtype=np.float32)
+                except Exception as batch_error:
+                    # Retry the batch one chunk at a time so a single bad chunk doesn't fail the rest
+                    logger.error(f"Batch embedding failed for {len(indices)} chunks, retrying individually: {str(batch_error)}")
+                    for i in indices:
+                        try:
+                            response = await openai_client.embeddings.create(
+                                model=EMBEDDING_MODEL,
+                                input=data.chunks[i].strip()
+                            )
+                            vectors[i] = np.asarray(response.data[0].embedding, dtype=np.float32)
+                        except Exception as chunk_error:
+                            failures.append(chunk_failure(i, data.chunks[i], chunk_error))
+            return vectors, failures
+
+        results = await asyncio.gather(*[
+            embed_slice(pending[start:start + EMBED_BATCH_SIZE])
+            for start in range(0, len(pending), EMBED_BATCH_SIZE)
+        ])
+        fresh = {}
+        for slice_vectors, slice_failures in results:
+            fresh.update(slice_vectors)
+            failed_chunks.extend(slice_failures)
+
+        vectors = {i: cached[h] for i, h in enumerate(hashes) if h in cached}
+        vectors.update(fresh)
+
+        # Store in ChromaDB with bulk adds (one transaction per CHROMA_ADD_BATCH rows)
+        created_at = str(uuid.uuid1().time)
+        rows = [
+            (
+                str(uuid.uuid4()),
+                data.chunks[i],
+                vectors[i],
+                {
+                    "type": data.type,
+                    "ref_id": data.id,
+                    "role": data.role or "",
+                    "chunk_index": data.start_index + i,
+                    "created_at": created_at
+                },
+                i
+            )
+            for i in sorted(vectors)
+        ]
+        for start in range(0, len(rows), CHROMA_ADD_BATCH):
+            batch = rows[start:start + CHROMA_ADD_BATCH]
             try:
-                logger.info(f"Processing chunk {i+1}/{len(data.chunks)} for {data.type}:{data.id}")
-                
-                # Create embedding using updated OpenAI API
-                response = openai_client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=text_chunk.strip()
-                )
-                
-                # Extract embedding vector
-                vector = response.data[0].embedding
-                
-                # Generate unique ID for this embedding
-                embed_id = str(uuid.uuid4())
-                
-                # Store in ChromaDB
                 collection.add(
-                    documents=[text_chunk],
-                    metadatas=[{
-                        "type": data.type,
-                        "ref_id": data.id,
-                        "role": data.role or "",
-                        "chunk_index": i,
-                        "created_at": str(uuid.uuid1().time)
-                    }],
-                    embeddings=[vector],
-                    ids=[embed_id]
+                    ids=[r[0] for r in batch],
+                    documents=[r[1] for r in batch],
+                    embeddings=np.stack([r[2] for r in batch]),
+                    metadatas=[r[3] for r in batch]
                 )
-                
-                embedded_ids.append(embed_id)
-                logger.info(f"Successfully embedded chunk {i+1} with ID: {embed_id}")
-                
-            except Exception as chunk_error:
-                error_msg = f"Failed to process chunk {i+1}: {str(chunk_error)}"
-                logger.error(error_msg)
-                logger.error(traceback.format_exc())
-                
-                failed_chunks.append({
-                    "chunk_index": i,
-                    "error": str(chunk_error),
-                    "chunk_preview": text_chunk[:100] + "..." if len(text_chunk) > 100 else text_chunk
-                })
-        
+                embedded_ids.extend(r[0] for r in batch)
+            except Exception as bulk_error:
+                # Fall back to per-row adds so one bad row doesn't drop the whole batch
+                logger.error(f"Bulk add failed, retrying {len(batch)} rows individually: {str(bulk_error)}")
+                for embed_id, text_chunk, vector, metadata, i in batch:
+                    try:
+                        collection.add(ids=[embed_id], documents=[text_chunk], embeddings=[vector], metadatas=[metadata])
+                        embedded_ids.append(embed_id)
+                    except Exception as chunk_error:
+                        failed_chunks.append(chunk_failure(i, text_chunk, chunk_error))
+        await asyncio.to_thread(
+            save_embed_results,
+            [(hashes[i], vector) for i, vector in fresh.items()],
+            data.type,
+            data.role or "",
+            len(embedded_ids)
+        )
+        logger.info(f"Stored {len(embedded_ids)} embeddings for {data.type}:{data.id}")
 
         # Determine response status
         total_chunks = len(data.chunks)
@@ -291,6 +482,28 @@ async def embed_text(data: EmbedChunk):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+class EmbedBatch(BaseModel):
+    items: List[EmbedChunk]
+
+
+@app.post("/embed/batch")
+async def embed_batch(data: EmbedBatch):
+    """Embed several documents in one request; results are returned in input order"""
+    logger.info(f"Batch embed request received - Items: {len(data.items)}")
+    # Items are independent documents, so embed them side by side; OpenAI calls
+    # stay bounded by the process-wide embed_semaphore
+    outcomes = await asyncio.gather(*(embed_text(item) for item in data.items), return_exceptions=True)
+    results = []
+    for outcome in outcomes:
+        if isinstance(outcome, HTTPException):
+            results.append({"status_code": outcome.status_code, "body": outcome.detail})
+        elif isinstance(outcome, Exception):
+            results.append({"status_code": 500, "body": f"Internal server error: {str(outcome)}"})
+        else:
+            results.append({"status_code": 200, "body": outcome.dict()})
+    return {"results": results}
+
+
 @app.get("/health")
 async def health():
     """Health check endpoint with detailed status"""
@@ -302,15 +515,18 @@ async def health():
             "components": {}
         }
         
-        # Check OpenAI connection
+        # Check OpenAI connection from the cached result; refresh it in the background when stale
+        global openai_check_task
         try:
             if openai_client:
-                # Quick test call
-                test_response = openai_client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input="health check"
-                )
-                health_status["components"]["openai"] = "healthy"
+                stale = time.time() - openai_check["checked_at"] > OPENAI_CHECK_TTL
+                if stale and (openai_check_task is None or openai_check_task.done()):
+                    openai_check_task = asyncio.create_task(refresh_openai_check())
+                if openai_check["ok"] is False:
+                    health_status["components"]["openai"] = f"error: {openai_check['error']}"
+                    health_status["status"] = "unhealthy"
+                else:
+                    health_status["components"]["openai"] = "healthy"
             else:
                 health_status["components"]["openai"] = "not_initialized"
                 health_status["status"] = "unhealthy"
@@ -360,17 +576,7 @@ async def get_stats():
         
         
         try:
-            # This might fail if collection is empty
-            all_metadata = collection.get(include=["metadatas"])
-            type_counts = {}
-            role_counts = {}
-            
-            for metadata in all_metadata.get('metadatas', []):
-                doc_type = metadata.get('type', 'unknown')
-                role = metadata.get('role', 'none')
-                
-                type_counts[doc_type] = type_counts.get(doc_type, 0) + 1
-                role_counts[role] = role_counts.get(role, 0) + 1
+            type_counts, role_counts = await asyncio.to_thread(read_stats)
             
             return {
                 "status": "success",
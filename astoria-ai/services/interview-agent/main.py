@@ -2,12 +2,15 @@ import os
 import logging
 import traceback
 import time
+import asyncio
 import sqlite3
+import queue
+from contextlib import contextmanager, asynccontextmanager
 import json
 from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from openai import OpenAI
+from openai import AsyncOpenAI
 import chromadb
 import httpx
 from dotenv import load_dotenv
@@ -25,7 +28,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One keep-alive pool for adaptive-engine and document-parser calls
+    app.state.http = httpx.AsyncClient(
+        timeout=30,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+    )
+    yield
+    await app.state.http.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -34,33 +48,111 @@ app.add_middleware(
     allow_headers=["*"],
 )
 load_dotenv()
-openai_client = OpenAI()
+openai_client = AsyncOpenAI()
 
 
 
 # ---- Persistent SQLite for Interview Sessions ----
 DB_PATH = os.getenv("INTERVIEW_SESSION_DB", "interview_sessions.db")
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+
+def open_connection():
+    # Autocommit mode; statements that must be atomic together open their own transaction
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    return conn
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn = open_connection()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS sessions (
             session_key TEXT PRIMARY KEY,
             candidate_id TEXT,
             job_id TEXT,
-            questions TEXT,
-            answers TEXT,
-            categories TEXT,
             context TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    conn.commit()
+    # One row per question, so answering or appending touches a single row
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS session_items (
+            session_key TEXT NOT NULL,
+            idx INTEGER NOT NULL,
+            question TEXT,
+            answer TEXT NOT NULL DEFAULT '',
+            category TEXT,
+            PRIMARY KEY (session_key, idx)
+        )
+    ''')
+    # Move questions out of the legacy JSON array columns, if this DB still has them
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(sessions)")}
+    if "questions" in columns:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute('''
+            INSERT OR IGNORE INTO session_items (session_key, idx, question, answer, category)
+            SELECT s.session_key, q.key, q.value,
+                   COALESCE(json_extract(s.answers, '$[' || q.key || ']'), ''),
+                   json_extract(s.categories, '$[' || q.key || ']')
+            FROM sessions s, json_each(s.questions) q
+            WHERE s.questions IS NOT NULL
+        ''')
+        conn.execute("UPDATE sessions SET questions = NULL, answers = NULL, categories = NULL WHERE questions IS NOT NULL")
+        conn.execute("COMMIT")
+    # Progress counters from before session_items; nothing maintains them any more
+    for column in ("answered_count", "question_count"):
+        if column in columns:
+            conn.execute(f"ALTER TABLE sessions DROP COLUMN {column}")
     return conn
 
-db_conn = init_db()
-db_cursor = db_conn.cursor()
+# Handlers and background tasks each borrow their own connection instead of sharing one cursor
+db_pool = queue.Queue(maxsize=DB_POOL_SIZE)
+db_pool.put(init_db())
+for _ in range(DB_POOL_SIZE - 1):
+    db_pool.put(open_connection())
+
+@contextmanager
+def get_conn():
+    conn = db_pool.get()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        db_pool.put(conn)
+
+
+
+# Hot-path statements as fixed strings, so each pooled connection's statement cache
+# (keyed on exact SQL text) skips re-parsing and re-planning them
+SQL_UPSERT_SESSION = '''
+    INSERT OR REPLACE INTO sessions (session_key, candidate_id, job_id, context, created_at)
+    VALUES (?, ?, ?, ?, ?)
+'''
+SQL_SELECT_CONTEXT = "SELECT context FROM sessions WHERE session_key = ?"
+SQL_DELETE_ITEMS = "DELETE FROM session_items WHERE session_key = ?"
+SQL_INSERT_ITEM = "INSERT INTO session_items (session_key, idx, question, answer, category) VALUES (?, ?, ?, '', ?)"
+# Single INSERT at the next index; atomic under SQLite's write lock
+SQL_APPEND_ITEM = '''
+    INSERT INTO session_items (session_key, idx, question, answer, category)
+    SELECT ?, COALESCE(MAX(idx) + 1, 0), ?, ?, ? FROM session_items WHERE session_key = ?
+'''
+# First unanswered item; the LEFT JOIN yields a NULL idx once every question is answered.
+# Answers made only of spaces, tabs or line breaks count as unanswered, as str.strip() would
+SQL_NEXT_ITEM = '''
+    SELECT i.idx, i.question, i.category
+    FROM sessions s
+    LEFT JOIN session_items i ON i.session_key = s.session_key AND trim(i.answer, ' ' || char(9, 10, 11, 12, 13)) = ''
+    WHERE s.session_key = ?
+    ORDER BY i.idx LIMIT 1
+'''
+SQL_FIND_ITEM = "SELECT idx, category FROM session_items WHERE session_key = ? AND question = ? ORDER BY idx LIMIT 1"
+SQL_SET_ANSWER = "UPDATE session_items SET answer = ? WHERE session_key = ? AND idx = ?"
+SQL_HAS_FOLLOW_UP = "SELECT 1 FROM session_items WHERE session_key = ? AND category = 'follow_up' LIMIT 1"
 
 
 
@@ -99,37 +191,53 @@ class SessionQuery(BaseModel):
 
 
 
-# ==== Helper: get current index ====
-def get_next_unanswered_index(answers):
-    for idx, ans in enumerate(answers):
-        if not ans.strip():
-            return idx
-    return len(answers)  # All answered
+# ==== Session DB helpers (blocking; run via asyncio.to_thread) ====
+def save_session(session_key, candidate_id, job_id, context_text, question_list, category_list):
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(SQL_UPSERT_SESSION, (
+            session_key,
+            candidate_id,
+            job_id,
+            json.dumps(context_text),
+            time.time()
+        ))
+        conn.execute(SQL_DELETE_ITEMS, (session_key,))
+        conn.executemany(
+            SQL_INSERT_ITEM,
+            [(session_key, idx, q, c) for idx, (q, c) in enumerate(zip(question_list, category_list))]
+        )
+        conn.execute("COMMIT")
+
+
+def fetch_next_item(session_key):
+    with get_conn() as conn:
+        return conn.execute(SQL_NEXT_ITEM, (session_key,)).fetchone()
+
+
+def record_answer(session_key, question, answer):
+    """Returns (context_list, category), or None when the session doesn't exist"""
+    with get_conn() as conn:
+        session = conn.execute(SQL_SELECT_CONTEXT, (session_key,)).fetchone()
+        if not session:
+            return None
+        context_list = json.loads(session[0]) if session[0] else []
+
+        item = conn.execute(SQL_FIND_ITEM, (session_key, question)).fetchone()
+        if item:
+            idx, category = item
+            conn.execute(SQL_SET_ANSWER, (answer, session_key, idx))
+        else:
+            category = "follow_up"
+            conn.execute(SQL_APPEND_ITEM, (session_key, question, answer, category, session_key))
+    return context_list, category
 
 
 # ==== Helper: Append follow-up to session ====
 def append_follow_up(session_key, follow_up_question, category="follow_up"):
-    db_cursor.execute("SELECT questions, answers, categories FROM sessions WHERE session_key = ?", (session_key,))
-    row = db_cursor.fetchone()
-    if row:
-        questions = json.loads(row[0])
-        answers = json.loads(row[1])
-        categories = json.loads(row[2])
-        questions.append(follow_up_question)
-        answers.append("")  # No answer yet
-        categories.append(category)
-        db_cursor.execute('''
-            UPDATE sessions
-            SET questions = ?, answers = ?, categories = ?
-            WHERE session_key = ?
-        ''', (
-            json.dumps(questions),
-            json.dumps(answers),
-            json.dumps(categories),
-            session_key
-        ))
-        db_conn.commit()
-        logger.info(f"[FollowUp] Appended follow-up to session {session_key}: {follow_up_question}")
+    with get_conn() as conn:
+        conn.execute(SQL_APPEND_ITEM, (session_key, follow_up_question, "", category, session_key))
+    logger.info(f"[FollowUp] Appended follow-up to session {session_key}: {follow_up_question}")
 
 
 
@@ -146,14 +254,20 @@ async def generate_questions(payload: InterviewInput):
     "job_post": [],
     "company_profile": []
     }
-    for ref_type, ref_id in [("resume", payload.candidate_id), ("job_post", payload.job_id), ("company_profile", company_id)]:
-        logger.info(f"[Interview] Querying ChromaDB for type: {ref_type}, id: {ref_id}")
-        try:
-            results = collection.get(where={"$and": [{"type": ref_type}, {"ref_id": ref_id}]})
-            docs = results.get("documents", [])
-            context_sections[ref_type].extend(docs)
-        except Exception as e:
-            logger.error(f"ChromaDB get failed for {ref_type}/{ref_id}: {e}")
+    refs = [("resume", payload.candidate_id), ("job_post", payload.job_id), ("company_profile", company_id)]
+    logger.info(f"[Interview] Querying ChromaDB for {refs}")
+    try:
+        # One get for all three sources, bucketed by each document's type metadata
+        results = collection.get(
+            where={"$or": [{"$and": [{"type": ref_type}, {"ref_id": ref_id}]} for ref_type, ref_id in refs]},
+            include=["documents", "metadatas"]
+        )
+        for doc, meta in zip(results.get("documents") or [], results.get("metadatas") or []):
+            ref_type = (meta or {}).get("type")
+            if ref_type in context_sections:
+                context_sections[ref_type].append(doc)
+    except Exception as e:
+        logger.error(f"ChromaDB get failed for {refs}: {e}")
     
     parts = []
     if context_sections["resume"]:
@@ -227,21 +341,26 @@ async def generate_questions(payload: InterviewInput):
     }}
     """
     try:
-        result = openai_client.chat.completions.create(
+        # Stream tokens as they are generated instead of waiting on one large response body
+        stream = await openai_client.chat.completions.create(
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": "You generate highly personalized, realistic interview questions based on resume, job description, and company culture."},
                 {"role": "user", "content": prompt}
             ],
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            stream=True
         )
-        question_json = result.choices[0].message.content.strip()
+        parts = []
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+        question_json = "".join(parts).strip()
         parsed = json.loads(question_json)
         questions = parsed.get("questions", [])
 
         question_list = [q["question"] for q in questions]
         category_list = [q["type"] for q in questions]
-        answer_list = [""] * len(question_list)
         logger.info("[Interview] Questions generated.")
 
     except Exception as e:
@@ -250,20 +369,9 @@ async def generate_questions(payload: InterviewInput):
         raise HTTPException(status_code=500, detail="AI question generation failed.")
 
     # --- Persist session to SQLite (main questions) ---
-    db_cursor.execute('''
-        INSERT OR REPLACE INTO sessions (session_key, candidate_id, job_id, questions, answers, categories, context, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        session_key,
-        payload.candidate_id,
-        payload.job_id,
-        json.dumps(question_list),
-        json.dumps(answer_list),
-        json.dumps(category_list),
-        json.dumps(context_text),
-        time.time()
-    ))
-    db_conn.commit()
+    await asyncio.to_thread(
+        save_session, session_key, payload.candidate_id, payload.job_id, context_text, question_list, category_list
+    )
 
     return {
         "success": True,
@@ -279,30 +387,25 @@ async def get_next_question(query: SessionQuery):
     session_key = f"{query.candidate_id}:{query.job_id}"
     logger.info(f"[Next] Next question requested for session {session_key}")
 
-    db_cursor.execute("SELECT questions, answers, categories FROM sessions WHERE session_key = ?", (session_key,))
-    row = db_cursor.fetchone()
+    row = await asyncio.to_thread(fetch_next_item, session_key)
     if not row:
         logger.warning("[Next] Session not initialized.")
         raise HTTPException(status_code=404, detail="Session not initialized.")
 
-    questions = json.loads(row[0])
-    answers = json.loads(row[1])
-    categories = json.loads(row[2])
-
-    idx = get_next_unanswered_index(answers)
-    if idx >= len(questions):
+    idx, question, category = row
+    if idx is None:
         logger.info("[Next] Interview complete for session")
         return {
             "message": "Interview complete. All questions answered.",
             "interview_complete": True
         }
 
-    logger.info(f"[Next] Returning question idx={idx}, category={categories[idx]}")
+    logger.info(f"[Next] Returning question idx={idx}, category={category}")
     return {
-        "category": categories[idx],
-        "question": questions[idx],
+        "category": category,
+        "question": question,
         "question_index": idx,
-        "type": categories[idx],
+        "type": category,
         "interview_complete": False
     }
 
@@ -314,42 +417,17 @@ async def submit_answer(payload: AnswerInput, background_tasks: BackgroundTasks)
     session_key = f"{payload.candidate_id}:{payload.job_id}"
     logger.info(f"[Answer] Received answer for {session_key} - question: {payload.question}")
 
-    # Find index of question being answered
-    db_cursor.execute("SELECT questions, answers, categories, context FROM sessions WHERE session_key = ?", (session_key,))
-    row = db_cursor.fetchone()
-    if not row:
+    # Find index of question being answered and store the answer
+    recorded = await asyncio.to_thread(record_answer, session_key, payload.question, payload.answer)
+    if recorded is None:
         logger.warning("[Answer] Session not found for answer submission.")
         raise HTTPException(status_code=404, detail="Session not found. Generate questions first.")
-
-    questions = json.loads(row[0])
-    answers = json.loads(row[1])
-    categories = json.loads(row[2])
-    context_list = json.loads(row[3]) if row[3] else []
-    try:
-        idx = questions.index(payload.question)
-    except ValueError:
-        idx = len(answers)
-        questions.append(payload.question)
-        answers.append("")
-        categories.append("follow_up")
-
-    answers[idx] = payload.answer
-    db_cursor.execute('''
-        UPDATE sessions
-        SET answers = ?, questions = ?, categories = ?
-        WHERE session_key = ?
-    ''', (
-        json.dumps(answers),
-        json.dumps(questions),
-        json.dumps(categories),
-        session_key
-    ))
-    db_conn.commit()
+    context_list, category = recorded
 
     # --- Background: Score answer, generate follow-up if needed ---
     background_tasks.add_task(
         score_and_maybe_append_followup,
-        session_key, payload, questions[idx], answers[idx], categories[idx], context_list
+        session_key, payload, payload.question, payload.answer, category, context_list
     )
 
     return {"success": True}
@@ -357,7 +435,8 @@ async def submit_answer(payload: AnswerInput, background_tasks: BackgroundTasks)
 
 
 # ==== Background task: call adaptive engine and append follow-up if needed ====
-def score_and_maybe_append_followup(session_key, payload, question, answer, category, context_list):
+# async so BackgroundTasks runs it on the event loop; the HTTP call awaits and never blocks other requests
+async def score_and_maybe_append_followup(session_key, payload, question, answer, category, context_list):
     answer_data = {
         "question": question,
         "answer": answer,
@@ -368,7 +447,7 @@ def score_and_maybe_append_followup(session_key, payload, question, answer, cate
     }
     try:
         logger.info(f"[AdaptiveBG] Sending to Adaptive Engine for scoring: {question}")
-        resp = httpx.post(ADAPTIVE_ENGINE_URL, json=answer_data, timeout=30)
+        resp = await app.state.http.post(ADAPTIVE_ENGINE_URL, json=answer_data, timeout=30)
         if resp.status_code != 200:
             logger.error(f"[AdaptiveBG] Adaptive Engine error {resp.status_code}: {resp.text}")
             return
@@ -381,26 +460,22 @@ def score_and_maybe_append_followup(session_key, payload, question, answer, cate
                 except Exception:
                     pass
             # Only append follow-up if needed and not already answered
+            # SQLite work runs on a worker thread with its own pooled connection
             if (isinstance(evaluation, dict)
                 and evaluation.get("follow_up")
                 and evaluation.get("classification") in ("vague", "incomplete", "off-topic")
-                and not already_followed_up(session_key)):
-                    append_follow_up(session_key, evaluation["follow_up"])
-    
+                and not await asyncio.to_thread(already_followed_up, session_key)):
+                    await asyncio.to_thread(append_follow_up, session_key, evaluation["follow_up"])
 
-            
     except Exception as e:
         logger.error(f"[AdaptiveBG] Error scoring answer or appending follow-up: {str(e)}")
 
 
 
 def already_followed_up(session_key):
-    db_cursor.execute("SELECT categories FROM sessions WHERE session_key = ?", (session_key,))
-    row = db_cursor.fetchone()
-    if not row:
-        return False
-    categories = json.loads(row[0]) if row[0] else []
-    return "follow_up" in categories
+    with get_conn() as conn:
+        row = conn.execute(SQL_HAS_FOLLOW_UP, (session_key,)).fetchone()
+    return row is not None
 
 
 
@@ -427,19 +502,32 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 #helper function
+# The company profile rarely changes, so keep the looked-up id for a few minutes
+COMPANY_ID_TTL = 300
+_company_id_cache = None  # (company_id, fetched_at)
+_company_id_lock = asyncio.Lock()
+
 async def get_single_company_id() -> str:
-    try:
-        resp = httpx.get("http://localhost:8001/company_profiles", timeout=10)
-        data = resp.json()
-        profiles = data.get("company_profiles", [])
+    global _company_id_cache
+    if _company_id_cache and time.time() - _company_id_cache[1] < COMPANY_ID_TTL:
+        return _company_id_cache[0]
+    # Only one request refreshes on a miss; the rest wait and reuse its result
+    async with _company_id_lock:
+        if _company_id_cache and time.time() - _company_id_cache[1] < COMPANY_ID_TTL:
+            return _company_id_cache[0]
+        try:
+            resp = await app.state.http.get("http://localhost:8001/company_profiles", timeout=10)
+            data = resp.json()
+            profiles = data.get("company_profiles", [])
 
-        if not profiles:
-            raise ValueError("No company profiles found")
+            if not profiles:
+                raise ValueError("No company profiles found")
 
-        return profiles[0]["company_id"]
-    except Exception as e:
-        logger.error(f"Failed to fetch company_id: {e}")
-        raise HTTPException(status_code=500, detail="Unable to fetch company_id")
+            _company_id_cache = (profiles[0]["company_id"], time.time())
+            return _company_id_cache[0]
+        except Exception as e:
+            logger.error(f"Failed to fetch company_id: {e}")
+            raise HTTPException(status_code=500, detail="Unable to fetch company_id")
 
 
 
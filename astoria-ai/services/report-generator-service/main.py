@@ -1,15 +1,25 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import os
+import secrets
 from jinja2 import Template
 import datetime
+import time
 import sqlite3
-import json
+import orjson
+import asyncio
+import logging
+from functools import lru_cache
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -17,15 +27,117 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Score reports run to several KB of JSON; compress anything past 1 KB
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# WAL lets scoring/report reads proceed while other services write; NORMAL sync is safe under WAL
+SQLITE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-20000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=5000;
+"""
+
+# Room for every statement a long-lived connection here will see, so none is re-prepared
+SQLITE_CACHED_STATEMENTS = 256
+
+def _open(path, **kwargs):
+    c = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                        cached_statements=SQLITE_CACHED_STATEMENTS, **kwargs)
+    c.executescript(SQLITE_PRAGMAS)
+    return c
 
 # Local DB for scores
 DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../scoring_cache.db"))
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
+conn = _open(DB_PATH)
 
 # External paths to pull candidate and job data
 PARSER_DB = os.path.abspath(os.path.join(os.path.dirname(__file__), "../document-parser/parser_cache.db"))
 AUTH_DB = os.path.abspath(os.path.join(os.path.dirname(__file__), "../user-auth-service/user_auth.db"))
+# Opened once and shared; Connection.execute hands each request its own cursor
+parser_conn = _open(PARSER_DB)
+
+SQL_SELECT_SCORE = "SELECT score_json FROM scoring_results WHERE candidate_id = ? AND job_id = ?"
+
+# Scalar subqueries rather than an inner JOIN so a job title still resolves when the candidate has no mapping row
+SQL_PARSED_DOCS = '''
+    SELECT (SELECT parsed_resume FROM candidate_job_map WHERE candidate_id = ? AND job_id = ?),
+           (SELECT parsed_json FROM job_posts WHERE id = ?)
+'''
+
+# Blocking lookups, run via asyncio.to_thread so they don't stall the event loop
+def _load_score_json(candidate_id: str, job_id: str):
+    row = conn.execute(SQL_SELECT_SCORE, (candidate_id, job_id)).fetchone()
+    return row[0] if row else None
+
+
+def _load_parsed_docs(candidate_id: str, job_id: str):
+    return parser_conn.execute(SQL_PARSED_DOCS, (candidate_id, job_id, job_id)).fetchone()
+
+
+class _Unresolved(Exception):
+    """Carries fallback names out of the cached lookup so they aren't pinned in the cache"""
+
+    def __init__(self, names):
+        self.names = names
+
+
+def _resolve_names(candidate_id: str, job_id: str):
+    candidate_name = f"Candidate {candidate_id}"
+    job_title = f"Job {job_id}"
+    resolved = 0
+
+    parsed_resume = parsed_job = None
+    try:
+        parsed_resume, parsed_job = _load_parsed_docs(candidate_id, job_id)
+    except Exception:
+        logger.exception("Failed to load parsed documents")
+
+    try:
+        if parsed_resume:
+            parsed = orjson.loads(parsed_resume)
+            # A parse without the field is still unresolved, so the placeholder isn't cached
+            if parsed.get("full_name"):
+                candidate_name = parsed["full_name"]
+                resolved += 1
+    except Exception as e:
+        print("Failed to resolve candidate name:", e)
+
+    try:
+        if parsed_job:
+            parsed = orjson.loads(parsed_job)
+            if parsed.get("job_title"):
+                job_title = parsed["job_title"]
+                resolved += 1
+    except Exception as e:
+        print("Failed to resolve job title:", e)
+
+    if resolved < 2:
+        raise _Unresolved((candidate_name, job_title))
+    return candidate_name, job_title
+
+
+# Repeat reports skip the parser DB read and decoding the full resume/job blobs.
+# Only fully resolved pairs are cached, so a placeholder never outlives the parse that replaces it.
+@lru_cache(maxsize=2048)
+def _report_names(candidate_id: str, job_id: str):
+    return _resolve_names(candidate_id, job_id)
+
+
+def _lookup_names(candidate_id: str, job_id: str):
+    try:
+        return _report_names(candidate_id, job_id)
+    except _Unresolved as e:
+        return e.names
+
+
+# Report dates have minute resolution, so format once per minute instead of per request
+@lru_cache(maxsize=1)
+def _stamp(minute_bucket: int) -> str:
+    return datetime.datetime.fromtimestamp(minute_bucket * 60).strftime("%Y-%m-%d %H:%M")
+
 
 class ReportInput(BaseModel):
     candidate_id: str
@@ -36,46 +148,35 @@ class ReportInput(BaseModel):
 async def generate_report(data: ReportInput):
     # Load score report if not provided
     if data.score_report is None:
-        session_key = f"{data.candidate_id}:{data.job_id}"
-        cursor.execute("SELECT score_json FROM scoring_results WHERE session_key = ?", (session_key,))
-        row = cursor.fetchone()
-        if not row:
+        score_json = await asyncio.to_thread(_load_score_json, data.candidate_id, data.job_id)
+        if score_json is None:
             return {"error": "No score found in database for given candidate/job."}
-        score_report = json.loads(row[0])
+        score_report = orjson.loads(score_json)
     else:
         score_report = data.score_report
 
-   
-    candidate_name = f"Candidate {data.candidate_id}"
-    job_title = f"Job {data.job_id}"
-
-    try:
-        conn_p = sqlite3.connect(PARSER_DB, check_same_thread=False)
-        cur_p = conn_p.cursor()
-        cur_p.execute("SELECT parsed_resume FROM candidate_job_map WHERE candidate_id = ? AND job_id = ?", (data.candidate_id, data.job_id))
-        r = cur_p.fetchone()
-        if r:
-            parsed = json.loads(r[0])
-            candidate_name = parsed.get("full_name", candidate_name)
-    except Exception as e:
-        print("Failed to resolve candidate name:", e)
-
-    try:
-        cur_p.execute("SELECT parsed_json FROM job_posts WHERE id = ?", (data.job_id,))
-        r = cur_p.fetchone()
-        if r:
-            parsed = json.loads(r[0])
-            job_title = parsed.get("job_title", job_title)
-    except Exception as e:
-        print("Failed to resolve job title:", e)
+    candidate_name, job_title = await asyncio.to_thread(_lookup_names, data.candidate_id, data.job_id)
 
     return {
     "candidate_name": candidate_name,
     "job_title": job_title,
-    "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+    "date": _stamp(int(time.time()) // 60),
     "report": score_report
     }
 
+# Shared secret for the admin endpoints below; they are disabled while it is unset
+REPORT_ADMIN_TOKEN = os.getenv("REPORT_ADMIN_TOKEN", "")
+
+@app.post("/report/cache/clear")
+def clear_report_cache(x_admin_token: str = Header("")):
+    # Admin hook for when a resume or job post is re-parsed under the same ids
+    if not REPORT_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not secrets.compare_digest(x_admin_token.encode(), REPORT_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    _report_names.cache_clear()
+    return {"success": True}
+
 @app.get("/health")
 def health():
     return {"status": "report-generator live"}
@@ -1,14 +1,23 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
-from openai import OpenAI
+from openai import AsyncOpenAI
 import os
 import sqlite3
-import json
+import orjson
+import httpx
+import queue
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 load_dotenv()
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
@@ -16,49 +25,244 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-client = OpenAI()
+# Score reports run to several KB of JSON; compress anything past 1 KB
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+# The SDK retries 429s and 5xx with exponential backoff; bulk fan-out leans on that.
+# One pooled keep-alive client so concurrent scoring calls reuse TLS connections
+client = AsyncOpenAI(
+    max_retries=5,
+    http_client=httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+)
+SCORE_CONCURRENCY = int(os.getenv("SCORE_CONCURRENCY", "20"))
+
+# WAL lets scoring/report reads proceed while other services write; NORMAL sync is safe under WAL
+SQLITE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-20000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=5000;
+"""
+
+# Room for every statement a long-lived connection here will see, so none is re-prepared
+SQLITE_CACHED_STATEMENTS = 256
+
+def _open(path, **kwargs):
+    c = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                        cached_statements=SQLITE_CACHED_STATEMENTS, **kwargs)
+    c.executescript(SQLITE_PRAGMAS)
+    return c
 
 # --- Connect to the persistent interview session DB from interview-agent
 INTERVIEW_DB = os.getenv("INTERVIEW_SESSION_DB", "../interview-agent/interview_sessions.db")
-interview_conn = sqlite3.connect(INTERVIEW_DB, check_same_thread=False)
-interview_cursor = interview_conn.cursor()
+interview_conn = _open(INTERVIEW_DB)
+
+# interview-agent keeps one session_items row per question; the (session_key, idx) primary key
+# serves the ordered scan, so pairs are read straight off the cursor instead of via JSON arrays
+SQL_SELECT_CONTEXT = "SELECT context FROM sessions WHERE session_key = ?"
+SQL_SELECT_QA = "SELECT question, answer FROM session_items WHERE session_key = ? ORDER BY idx"
+
+# Transcript budget for the scoring prompt, approximated at ~4 characters per token
+QA_TOKEN_BUDGET = int(os.getenv("QA_TOKEN_BUDGET", "100000"))
+QA_CHAR_BUDGET = QA_TOKEN_BUDGET * 4
 
 # --- Own scoring results DB
 DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../scoring_cache.db"))
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
-cursor.execute('''
+# Single writer connection; the file is created here before the read-only pool attaches to it
+write_conn = _open(DB_PATH)
+# Keyed on (candidate_id, job_id) directly rather than a concatenated "cid:jid" string
+SCORING_RESULTS_DDL = '''
     CREATE TABLE IF NOT EXISTS scoring_results (
-        session_key TEXT PRIMARY KEY,
-        candidate_id TEXT,
-        job_id TEXT,
+        candidate_id TEXT NOT NULL,
+        job_id TEXT NOT NULL,
         score_json TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (candidate_id, job_id)
+    )
+'''
+
+def migrate_scoring_results():
+    # Rebuild tables from the session_key era under the composite key, in one transaction
+    columns = {row[1] for row in write_conn.execute("PRAGMA table_info(scoring_results)")}
+    if "session_key" not in columns:
+        return
+    write_conn.executescript('''
+        BEGIN IMMEDIATE;
+        DROP VIEW IF EXISTS scoring_results_v;
+        ALTER TABLE scoring_results RENAME TO scoring_results_legacy;
+    ''' + SCORING_RESULTS_DDL + ''';
+        INSERT OR REPLACE INTO scoring_results (candidate_id, job_id, score_json, created_at)
+        SELECT COALESCE(candidate_id, substr(session_key, 1, instr(session_key, ':') - 1)),
+               COALESCE(job_id, substr(session_key, instr(session_key, ':') + 1)),
+               score_json, created_at
+        FROM scoring_results_legacy
+        ORDER BY created_at;
+        DROP TABLE scoring_results_legacy;
+        COMMIT;
+    ''')
+
+migrate_scoring_results()
+write_conn.execute(SCORING_RESULTS_DDL)
+# Old "cid:jid" lookups keep working against the view
+write_conn.execute('''
+    CREATE VIEW IF NOT EXISTS scoring_results_v AS
+    SELECT candidate_id || ':' || job_id AS session_key, * FROM scoring_results
+''')
+# Bulk scoring passes submitted through the OpenAI Batch API
+write_conn.execute('''
+    CREATE TABLE IF NOT EXISTS score_batches (
+        batch_id TEXT PRIMARY KEY,
+        status TEXT,
+        request_count INTEGER,
+        stored_count INTEGER DEFAULT 0,
+        failed TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
 ''')
-conn.commit()
-
-class ScoreInput(BaseModel):
-    candidate_id: str
-    job_id: str
-
-@app.post("/score/candidate")
-async def score_candidate(payload: ScoreInput):
-    session_key = f"{payload.candidate_id}:{payload.job_id}"
-    interview_cursor.execute("SELECT * FROM sessions WHERE session_key = ?", (session_key,))
-    row = interview_cursor.fetchone()
+# JSON list of session keys the batch couldn't score; added after the table first shipped
+if "failed" not in {row[1] for row in write_conn.execute("PRAGMA table_info(score_batches)")}:
+    write_conn.execute("ALTER TABLE score_batches ADD COLUMN failed TEXT")
+# Fresh planner statistics at startup; analysis_limit keeps ANALYZE to sampled index pages
+write_conn.execute("PRAGMA analysis_limit=400")
+write_conn.execute("ANALYZE")
+
+# Readers get their own read-only connections so GETs never queue behind the writer
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", str(os.cpu_count() or 4)))
+READ_PRAGMAS = """
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-20000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=5000;
+"""
+
+def _open_ro(path):
+    c = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False, isolation_level=None,
+                        cached_statements=SQLITE_CACHED_STATEMENTS)
+    c.executescript(READ_PRAGMAS)
+    return c
+
+read_pool = queue.SimpleQueue()
+for _ in range(DB_READ_POOL_SIZE):
+    read_pool.put(_open_ro(DB_PATH))
+
+@contextmanager
+def acquire_read():
+    c = read_pool.get()
+    try:
+        yield c.cursor()
+    finally:
+        read_pool.put(c)
+
+
+# Pool checkout can block, so async routes call this via asyncio.to_thread
+def _read_one(sql: str, params: tuple):
+    with acquire_read() as cur:
+        return cur.execute(sql, params).fetchone()
+
+SQL_SELECT_SCORE = "SELECT score_json FROM scoring_results WHERE candidate_id = ? AND job_id = ?"
+SQL_SELECT_BATCH = "SELECT status, stored_count, failed FROM score_batches WHERE batch_id = ?"
+SQL_INSERT_BATCH = "INSERT INTO score_batches (batch_id, status, request_count) VALUES (?, ?, ?)"
+SQL_UPDATE_BATCH_STATUS = "UPDATE score_batches SET status = ? WHERE batch_id = ? AND status NOT IN ('storing', 'stored')"
+# Only one poll may move a completed batch to 'storing' and fetch its results
+SQL_CLAIM_BATCH = "UPDATE score_batches SET status = 'storing' WHERE batch_id = ? AND status NOT IN ('storing', 'stored')"
+SQL_RELEASE_BATCH = "UPDATE score_batches SET status = 'completed' WHERE batch_id = ? AND status = 'storing'"
+SQL_MARK_BATCH_STORED = "UPDATE score_batches SET status = 'stored', stored_count = ?, failed = ? WHERE batch_id = ?"
+
+# Update the existing row in place instead of REPLACE's delete + reinsert
+SQL_UPSERT_SCORE = '''
+    INSERT INTO scoring_results (candidate_id, job_id, score_json)
+    VALUES (?, ?, ?)
+    ON CONFLICT(candidate_id, job_id) DO UPDATE SET
+        score_json = excluded.score_json,
+        created_at = CURRENT_TIMESTAMP
+'''
+
+def _qa_text(pairs) -> str:
+    # Stops pulling rows once the budget is spent, so very long interviews are never fully loaded
+    parts = []
+    used = 0
+    for question, answer in pairs:
+        part = f"Q: {question}\nA: {answer}"
+        used += len(part) + 2
+        if used > QA_CHAR_BUDGET:
+            break
+        parts.append(part)
+    return "\n\n".join(parts)
+
+
+# Blocking SQLite work, run via asyncio.to_thread so the event loop stays free for the OpenAI calls
+def _load_session(session_key: str):
+    row = interview_conn.execute(SQL_SELECT_CONTEXT, (session_key,)).fetchone()
     if not row:
-        return {"error": "No interview data found for this candidate/job."}
-
-    questions = json.loads(row[3])
-    answers = json.loads(row[4])
-    categories = json.loads(row[5])
-    context = row[6]
-
-    qa_pairs = [f"Q: {q}\nA: {a}" for q, a in zip(questions, answers)]
-    qa_text = "\n\n".join(qa_pairs)
-
-    json_example = """
+        return None
+    return {
+        "context": row[0],
+        "qa_text": _qa_text(interview_conn.execute(SQL_SELECT_QA, (session_key,)))
+    }
+
+
+# Worker threads share write_conn, so its explicit transactions must not interleave
+write_lock = threading.Lock()
+
+# Dashboards poll the same reports over and over; serve recent ones from memory.
+# Holds the finished GET response body, so a hit skips SQLite and both JSON passes
+SCORE_CACHE_TTL = int(os.getenv("SCORE_CACHE_TTL", "60"))
+SCORE_CACHE_MAX = int(os.getenv("SCORE_CACHE_MAX", "10000"))
+_score_cache = OrderedDict()  # (candidate_id, job_id) -> (body, cached_at)
+_score_cache_lock = threading.Lock()
+
+def _cache_score(key: tuple, score_json: str, overwrite: bool = True) -> bytes:
+    body = b'{"score_report":' + score_json.encode() + b'}'
+    with _score_cache_lock:
+        # A read-through fill must not clobber a newer entry a writer cached meanwhile
+        if not overwrite and key in _score_cache:
+            return body
+        _score_cache[key] = (body, time.monotonic())
+        _score_cache.move_to_end(key)
+        if len(_score_cache) > SCORE_CACHE_MAX:
+            _score_cache.popitem(last=False)
+    return body
+
+
+def _cached_score(key: tuple):
+    with _score_cache_lock:
+        entry = _score_cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] >= SCORE_CACHE_TTL:
+            del _score_cache[key]
+            return None
+        _score_cache.move_to_end(key)
+        return entry[0]
+
+
+def _store_scores(rows: list[tuple]):
+    """Upsert (candidate_id, job_id, score_json) rows in one transaction"""
+    with write_lock:
+        # Take the write lock up front so a concurrent reader can't turn this into SQLITE_BUSY mid-upsert
+        write_conn.execute("BEGIN IMMEDIATE")
+        try:
+            write_conn.executemany(SQL_UPSERT_SCORE, rows)
+            write_conn.execute("COMMIT")
+        except Exception:
+            write_conn.execute("ROLLBACK")
+            raise
+    # Only after commit, so the cache never runs ahead of the database
+    for candidate_id, job_id, score_json in rows:
+        _cache_score((candidate_id, job_id), score_json)
+
+
+def _write(sql: str, params: tuple) -> int:
+    with write_lock:
+        return write_conn.execute(sql, params).rowcount
+
+
+# Static scoring prompt, assembled once; per request only context and transcript are spliced in
+SCORE_JSON_EXAMPLE = """
         {
         "technical": 8,
         "communication": 9,
@@ -72,7 +276,7 @@ async def score_candidate(payload: ScoreInput):
         ]
         }
         """
-    prompt = f"""
+PROMPT_GUIDELINES = """
     You are an AI-powered candidate evaluation assistant designed to help recruiters make high-confidence decisions after a structured interview.
 
     You are evaluating whether the candidate is a strong fit **strictly based on the job description, company expectations, the candidate's resume, and their answers during the interview.**
@@ -134,50 +338,334 @@ async def score_candidate(payload: ScoreInput):
 
     ---
 
-    ### Output Format:
+    """
+PROMPT_HEAD = PROMPT_GUIDELINES + """### Output Format:
     Return a single JSON object like this:
-    {json_example}
+    """ + SCORE_JSON_EXAMPLE + """
 
     ---
 
     ### Interview Context:
-    {context}
+    """
+PROMPT_TAIL = """
 
     ---
 
     ### Interview Transcript:
-    {qa_text}
     """
-    
+PROMPT_END = """
+    """
+SYSTEM_MSG = {"role": "system", "content": "You are a structured scoring bot."}
+
+# Microbatch variant: same guidelines, several interviews per call, one result object per candidate
+PROMPT_MULTI_HEAD = PROMPT_GUIDELINES + """### Output Format:
+    You are evaluating several candidates, each from a separate interview. Score every candidate independently
+    and never let one candidate's evidence influence another's scores.
+    Return a single JSON object of the form {"results": [...]} with one entry per candidate. Each entry is an
+    object like the one below, plus "candidate_id" and "job_id" copied exactly from that candidate's header:
+    """ + SCORE_JSON_EXAMPLE + """
+
+    ---
+"""
+MICROBATCH_MAX = int(os.getenv("SCORE_MICROBATCH_MAX", "5"))
+
+
+def build_score_request(row) -> dict:
+    """Chat completion body for one interview session, shared by live and batch scoring"""
+    prompt = PROMPT_HEAD + (row["context"] or "") + PROMPT_TAIL + row["qa_text"] + PROMPT_END
+
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            SYSTEM_MSG,
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"}
+    }
+
+
+async def _score_session(row) -> dict:
+    # Streamed so the connection never idles for the whole generation
+    stream = await client.chat.completions.create(**build_score_request(row), stream=True)
+    parts = []
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+    return orjson.loads("".join(parts).strip())
+
+
+def _sse(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+class ScoreInput(BaseModel):
+    candidate_id: str
+    job_id: str
+
+@app.post("/score/candidate")
+async def score_candidate(payload: ScoreInput):
+    session_key = f"{payload.candidate_id}:{payload.job_id}"
+    row = await asyncio.to_thread(_load_session, session_key)
+    if not row:
+        return {"error": "No interview data found for this candidate/job."}
+
+    try:
+        score_report = await _score_session(row)
+
+        await asyncio.to_thread(_store_scores, [(payload.candidate_id, payload.job_id, orjson.dumps(score_report).decode())])
+
+        return {"score_report": score_report}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.post("/score/candidate/stream")
+async def score_candidate_stream(payload: ScoreInput):
+    """Same as /score/candidate, but relays the report as server-sent events while it is generated"""
+    session_key = f"{payload.candidate_id}:{payload.job_id}"
+    row = await asyncio.to_thread(_load_session, session_key)
+    if not row:
+        return {"error": "No interview data found for this candidate/job."}
+
+    async def events():
+        parts = []
+        try:
+            stream = await client.chat.completions.create(**build_score_request(row), stream=True)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    delta = chunk.choices[0].delta.content
+                    parts.append(delta)
+                    yield _sse("delta", delta)
+            score_report = orjson.loads("".join(parts).strip())
+            await asyncio.to_thread(_store_scores, [(payload.candidate_id, payload.job_id, orjson.dumps(score_report).decode())])
+            yield _sse("score_report", score_report)
+        except Exception as e:
+            yield _sse("error", str(e))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+class ScoreBatchInput(BaseModel):
+    candidates: list[ScoreInput]
+
+
+@app.post("/score/candidates")
+async def score_candidates(payload: ScoreBatchInput):
+    """Live-score many candidates at once, overlapping the OpenAI round trips"""
+    sem = asyncio.Semaphore(SCORE_CONCURRENCY)
+
+    async def one(item: ScoreInput):
+        session_key = f"{item.candidate_id}:{item.job_id}"
+        result = {"candidate_id": item.candidate_id, "job_id": item.job_id}
+        row = await asyncio.to_thread(_load_session, session_key)
+        if not row:
+            result["error"] = "No interview data found for this candidate/job."
+            return result
+        try:
+            async with sem:
+                result["score_report"] = await _score_session(row)
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    results = await asyncio.gather(*(one(item) for item in payload.candidates))
+    rows = [
+        (r["candidate_id"], r["job_id"], orjson.dumps(r["score_report"]).decode())
+        for r in results if "score_report" in r
+    ]
+    try:
+        if rows:
+            await asyncio.to_thread(_store_scores, rows)
+        return {"results": results}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.post("/score/candidates/microbatch")
+async def score_candidates_microbatch(payload: ScoreBatchInput):
+    """Score up to MICROBATCH_MAX short interviews in one completion, sharing the instruction tokens"""
+    if len(payload.candidates) > MICROBATCH_MAX:
+        return {"error": f"At most {MICROBATCH_MAX} candidates per microbatch."}
+
+    sections = []
+    expected = {}
+    missing = []
+    for item in payload.candidates:
+        session_key = f"{item.candidate_id}:{item.job_id}"
+        if session_key in expected:
+            continue
+        row = await asyncio.to_thread(_load_session, session_key)
+        if not row:
+            missing.append(session_key)
+            continue
+        expected[session_key] = item
+        sections.append(
+            f"\n    ### Candidate (candidate_id: {item.candidate_id}, job_id: {item.job_id})\n\n"
+            f"    #### Interview Context:\n    {row['context'] or ''}\n\n"
+            f"    #### Interview Transcript:\n    {row['qa_text']}\n\n    ---\n"
+        )
+
+    if not sections:
+        return {"error": "No interview data found for any requested candidate/job.", "missing": missing}
+
     try:
-        result = client.chat.completions.create(
+        result = await client.chat.completions.create(
             model="gpt-4o",
             messages=[
-                {"role": "system", "content": "You are a structured scoring bot."},
-                {"role": "user", "content": prompt}
+                SYSTEM_MSG,
+                {"role": "user", "content": PROMPT_MULTI_HEAD + "".join(sections)}
             ],
             response_format={"type": "json_object"}
         )
-        score_report_json = result.choices[0].message.content.strip()
-        score_report = json.loads(score_report_json)
+        entries = orjson.loads(result.choices[0].message.content.strip()).get("results", [])
+
+        results = []
+        rows = []
+        for entry in entries:
+            session_key = f"{entry.get('candidate_id')}:{entry.get('job_id')}"
+            item = expected.pop(session_key, None)
+            if item is None:
+                continue
+            score_report = {k: v for k, v in entry.items() if k not in ("candidate_id", "job_id")}
+            rows.append((item.candidate_id, item.job_id, orjson.dumps(score_report).decode()))
+            results.append({"candidate_id": item.candidate_id, "job_id": item.job_id, "score_report": score_report})
+        # Anything the model dropped or mislabelled is reported rather than guessed at
+        for item in expected.values():
+            results.append({"candidate_id": item.candidate_id, "job_id": item.job_id, "error": "Missing from model output."})
+
+        if rows:
+            await asyncio.to_thread(_store_scores, rows)
+        return {"results": results, "missing": missing}
+    except Exception as e:
+        return {"error": str(e)}
 
-        cursor.execute("REPLACE INTO scoring_results (session_key, candidate_id, job_id, score_json) VALUES (?, ?, ?, ?)",
-                       (session_key, payload.candidate_id, payload.job_id, json.dumps(score_report)))
-        conn.commit()
 
-        return {"score_report": score_report}
+async def _submit_score_batch(lines: list[bytes]):
+    uploaded = await client.files.create(file=("score_batch.jsonl", b"\n".join(lines)), purpose="batch")
+    return await client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+
+
+@app.post("/score/batch")
+async def submit_score_batch(payload: ScoreBatchInput):
+    """Queue a bulk scoring pass on the Batch API: half the price of live calls, results within 24h"""
+    lines = []
+    missing = []
+    for item in payload.candidates:
+        session_key = f"{item.candidate_id}:{item.job_id}"
+        row = await asyncio.to_thread(_load_session, session_key)
+        if not row:
+            missing.append(session_key)
+            continue
+        lines.append(orjson.dumps({
+            "custom_id": session_key,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": build_score_request(row)
+        }))
+
+    if not lines:
+        return {"error": "No interview data found for any requested candidate/job.", "missing": missing}
+
+    try:
+        batch = await _submit_score_batch(lines)
+        await asyncio.to_thread(
+            _write,
+            SQL_INSERT_BATCH,
+            (batch.id, batch.status, len(lines))
+        )
+        return {"batch_id": batch.id, "status": batch.status, "submitted": len(lines), "missing": missing}
     except Exception as e:
         return {"error": str(e)}
 
 
+def _parse_batch_output(output: str):
+    rows = []
+    failed = []
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        result = orjson.loads(line)
+        session_key = result["custom_id"]
+        try:
+            content = result["response"]["body"]["choices"][0]["message"]["content"]
+            score_report = orjson.loads(content.strip())
+        except Exception:
+            failed.append(session_key)
+            continue
+        candidate_id, job_id = session_key.split(":", 1)
+        rows.append((candidate_id, job_id, orjson.dumps(score_report).decode()))
+    return rows, failed
+
+
+def _parse_batch_errors(errors: str):
+    # Requests that failed outright land in the error file instead of the output file
+    return [orjson.loads(line)["custom_id"] for line in errors.splitlines() if line.strip()]
+
+
+@app.get("/score/batch/{batch_id}")
+async def get_score_batch(batch_id: str):
+    tracked = await asyncio.to_thread(_read_one, SQL_SELECT_BATCH, (batch_id,))
+    if not tracked:
+        return {"error": "Unknown batch id."}
+    if tracked[0] == "stored":
+        return {"batch_id": batch_id, "status": "stored", "stored": tracked[1], "failed": orjson.loads(tracked[2] or "[]")}
+    if tracked[0] == "storing":
+        return {"batch_id": batch_id, "status": "storing"}
+
+    try:
+        batch = await client.batches.retrieve(batch_id)
+        if batch.status != "completed":
+            await asyncio.to_thread(
+                _write,
+                SQL_UPDATE_BATCH_STATUS,
+                (batch.status, batch_id)
+            )
+            return {"batch_id": batch_id, "status": batch.status}
+
+        # Claim the batch before fetching results, so concurrent polls don't both store it
+        if not await asyncio.to_thread(_write, SQL_CLAIM_BATCH, (batch_id,)):
+            return {"batch_id": batch_id, "status": "storing"}
+    except Exception as e:
+        return {"error": str(e)}
+
+    try:
+        rows, failed = [], []
+        # A batch where every request failed has only an error file
+        if batch.output_file_id:
+            output = await client.files.content(batch.output_file_id)
+            rows, failed = _parse_batch_output(output.text)
+        if batch.error_file_id:
+            errors = await client.files.content(batch.error_file_id)
+            failed.extend(_parse_batch_errors(errors.text))
+        if rows:
+            await asyncio.to_thread(_store_scores, rows)
+        await asyncio.to_thread(
+            _write,
+            SQL_MARK_BATCH_STORED,
+            (len(rows), orjson.dumps(failed).decode(), batch_id)
+        )
+        return {"batch_id": batch_id, "status": "stored", "stored": len(rows), "failed": failed}
+    except Exception as e:
+        # Hand the batch back so a later poll can retry
+        await asyncio.to_thread(_write, SQL_RELEASE_BATCH, (batch_id,))
+        return {"error": str(e)}
+
+
 @app.get("/score/candidate")
-def get_score(candidate_id: str, job_id: str):
-    session_key = f"{candidate_id}:{job_id}"
-    cursor.execute("SELECT score_json FROM scoring_results WHERE session_key = ?", (session_key,))
-    row = cursor.fetchone()
-    if not row:
-        return {"error": "Score report not found."}
-    return {"score_report": json.loads(row[0])}
+async def get_score(candidate_id: str, job_id: str):
+    key = (candidate_id, job_id)
+    body = _cached_score(key)
+    if body is None:
+        row = await asyncio.to_thread(_read_one, SQL_SELECT_SCORE, key)
+        if not row:
+            return {"error": "Score report not found."}
+        body = _cache_score(key, row[0], overwrite=False)
+    # score_json is already serialized JSON, so splice it in rather than decode and re-encode
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/health")
@@ -1,12 +1,24 @@
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, EmailStr
 import sqlite3
 import os
+import asyncio
+import queue
+import threading
+from contextlib import contextmanager
 from passlib.hash import bcrypt
 import datetime
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+# Fail fast instead of silently hashing with a slow fallback if the C extension is missing
+bcrypt.set_backend("bcrypt")
+# Cost factor for new hashes (each +1 doubles the work); verify reads the rounds from the stored hash,
+# so changing this never invalidates existing passwords
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+password_hasher = bcrypt.using(rounds=BCRYPT_ROUNDS)
+
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -15,9 +27,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# WAL lets login lookups on the read pool run while a signup insert commits; NORMAL sync is safe under WAL
+SQLITE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-20000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=5000;
+"""
+
+# Room for every statement a long-lived connection here will see, so none is re-prepared
+SQLITE_CACHED_STATEMENTS = 256
+
+def _open(path, **kwargs):
+    c = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                        cached_statements=SQLITE_CACHED_STATEMENTS, **kwargs)
+    c.executescript(SQLITE_PRAGMAS)
+    return c
+
 DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../user_auth.db"))
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
+# Signups go through the single writer; logins draw from the read-only pool below
+write_conn = _open(DB_PATH)
+# Signup inserts run on to_thread workers; serialize their use of write_conn
+write_lock = threading.Lock()
+
+# Login lookups get their own read-only connections so they never wait on a signup insert
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", str(os.cpu_count() or 4)))
+READ_PRAGMAS = """
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-20000;
+    PRAGMA mmap_size=268435456;
+    PRAGMA busy_timeout=5000;
+"""
+
+def _open_ro(path):
+    c = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False, isolation_level=None,
+                        cached_statements=SQLITE_CACHED_STATEMENTS)
+    c.executescript(READ_PRAGMAS)
+    return c
+
+read_pool = queue.SimpleQueue()
+for _ in range(DB_READ_POOL_SIZE):
+    read_pool.put(_open_ro(DB_PATH))
+
+@contextmanager
+def acquire_read():
+    c = read_pool.get()
+    try:
+        yield c.cursor()
+    finally:
+        read_pool.put(c)
 
 class RecruiterSignup(BaseModel):
     email: EmailStr
@@ -35,16 +95,43 @@ class UserLogin(BaseModel):
     password: str
 
 
+SQL_INSERT_RECRUITER = '''
+    INSERT INTO recruiters (email, password_hash, name, company_name)
+    VALUES (?, ?, ?, ?)'''
+SQL_INSERT_CANDIDATE = '''
+    INSERT INTO candidates (email, password_hash, name)
+    VALUES (?, ?, ?)'''
+SQL_SELECT_RECRUITER = 'SELECT recruiter_id, password_hash, name, company_name FROM recruiters WHERE email = ?'
+SQL_SELECT_CANDIDATE = 'SELECT candidate_id, password_hash, name FROM candidates WHERE email = ?'
+
+
+# Called through asyncio.to_thread; inserts share write_conn under write_lock, lookups use the read pool
+def _insert_recruiter(data: RecruiterSignup, hashed: str):
+    with write_lock:
+        write_conn.execute(SQL_INSERT_RECRUITER, (data.email, hashed, data.name, data.company_name))
+
+
+def _insert_candidate(data: CandidateSignup, hashed: str):
+    with write_lock:
+        write_conn.execute(SQL_INSERT_CANDIDATE, (data.email, hashed, data.name))
+
+
+def _fetch_recruiter(email: str):
+    with acquire_read() as cur:
+        return cur.execute(SQL_SELECT_RECRUITER, (email,)).fetchone()
+
+
+def _fetch_candidate(email: str):
+    with acquire_read() as cur:
+        return cur.execute(SQL_SELECT_CANDIDATE, (email,)).fetchone()
+
+
 # --- Recruiter Signup ---
 @app.post("/auth/recruiter/signup")
-def recruiter_signup(data: RecruiterSignup):
-    hashed = bcrypt.hash(data.password)
+async def recruiter_signup(data: RecruiterSignup):
+    hashed = await asyncio.to_thread(password_hasher.hash, data.password)
     try:
-        cursor.execute('''
-        INSERT INTO recruiters (email, password_hash, name, company_name)
-        VALUES (?, ?, ?, ?)''',
-        (data.email, hashed, data.name, data.company_name))
-        conn.commit()
+        await asyncio.to_thread(_insert_recruiter, data, hashed)
         return {"success": True, "message": "Recruiter created"}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=409, detail="Email already exists.")
@@ -52,14 +139,10 @@ def recruiter_signup(data: RecruiterSignup):
 
 # --- Candidate Signup ---
 @app.post("/auth/candidate/signup")
-def candidate_signup(data: CandidateSignup):
-    hashed = bcrypt.hash(data.password)
+async def candidate_signup(data: CandidateSignup):
+    hashed = await asyncio.to_thread(password_hasher.hash, data.password)
     try:
-        cursor.execute('''
-        INSERT INTO candidates (email, password_hash, name)
-        VALUES (?, ?, ?)''',
-        (data.email, hashed, data.name))
-        conn.commit()
+        await asyncio.to_thread(_insert_candidate, data, hashed)
         return {"success": True, "message": "Candidate created"}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=409, detail="Email already exists.")
@@ -67,10 +150,9 @@ def candidate_signup(data: CandidateSignup):
 
 # --- Recruiter Login ---
 @app.post("/auth/recruiter/login")
-def recruiter_login(data: UserLogin):
-    cursor.execute('SELECT recruiter_id, password_hash, name, company_name FROM recruiters WHERE email = ?', (data.email,))
-    row = cursor.fetchone()
-    if not row or not bcrypt.verify(data.password, row[1]):
+async def recruiter_login(data: UserLogin):
+    row = await asyncio.to_thread(_fetch_recruiter, data.email)
+    if not row or not await asyncio.to_thread(bcrypt.verify, data.password, row[1]):
         raise HTTPException(status_code=401, detail="Invalid email or password.")
     return {
         "success": True,
@@ -83,10 +165,9 @@ def recruiter_login(data: UserLogin):
 
 # --- Candidate Login ---
 @app.post("/auth/candidate/login")
-def candidate_login(data: UserLogin):
-    cursor.execute('SELECT candidate_id, password_hash, name FROM candidates WHERE email = ?', (data.email,))
-    row = cursor.fetchone()
-    if not row or not bcrypt.verify(data.password, row[1]):
+async def candidate_login(data: UserLogin):
+    row = await asyncio.to_thread(_fetch_candidate, data.email)
+    if not row or not await asyncio.to_thread(bcrypt.verify, data.password, row[1]):
         raise HTTPException(status_code=401, detail="Invalid email or password.")
     return {
         "success": True,
@@ -1,16 +1,24 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 import os
+import httpx
 from openai import OpenAI
 
 # Load the .env file
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
 
-# Create OpenAI client
-client = OpenAI(api_key=api_key)
+# Create OpenAI client; the pooled http client keeps the TLS connection alive between calls
+client = OpenAI(
+    api_key=api_key,
+    http_client=httpx.Client(
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+)
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 @app.get("/test-openai")
 async def test_openai():